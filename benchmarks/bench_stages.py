@@ -0,0 +1,115 @@
+"""Times the stages of `cim2linkml` separately on synthetic models of several sizes.
+
+Run `python -m benchmarks.bench_stages --help` from the repository root.
+"""
+
+import json
+import os
+import sqlite3
+import tempfile
+import time
+from itertools import chain
+
+import click
+
+from benchmarks.synthetic_qea import SyntheticModel, build_synthetic_qea
+from cim_to_linkml.generator import GenerationContext, generate_schema
+from cim_to_linkml.parser import parse_uml_project
+from cim_to_linkml.read import read_uml_project
+from cim_to_linkml.writer import write_schema
+
+STAGES = ("read", "parse", "index", "generate", "generate_single", "write")
+
+
+def bench_model(model: SyntheticModel, work_dir: str) -> dict[str, float]:
+    """Runs every stage once on the model, returning the wall time per stage in seconds."""
+
+    qea_file = os.path.join(work_dir, "model.qea")
+    build_synthetic_qea(qea_file, model)
+
+    timings = {}
+
+    # The cursors are lazy, so the rows are fetched to time the reading by itself.
+    start = time.perf_counter()
+    with sqlite3.connect(qea_file) as conn:
+        results = [cur.fetchall() for cur in read_uml_project(conn)]
+    timings["read"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    uml_project = parse_uml_project(*results)
+    timings["parse"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    uml_project.build_indexes()
+    timings["index"] = time.perf_counter() - start
+
+    uml_root_package = uml_project.packages.by_qualified_name["TC57CIM"]
+    uml_packages = uml_project.packages.get_subtree(uml_root_package.id)
+
+    start = time.perf_counter()
+    with GenerationContext(uml_project) as ctx:
+        schemas = [
+            (
+                uml_project.packages.get_qualified_name(p.id),
+                generate_schema(p, uml_project.classes.by_package.get(p.id, []), uml_project, ctx),
+            )
+            for p in uml_packages
+        ]
+    timings["generate"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    with GenerationContext(uml_project) as ctx:
+        uml_classes = list(chain.from_iterable(uml_project.classes.by_package.get(p.id, []) for p in uml_packages))
+        generate_schema(uml_root_package, uml_classes, uml_project, ctx)
+    timings["generate_single"] = time.perf_counter() - start
+
+    out_dir = os.path.join(work_dir, "schemas")
+    os.makedirs(out_dir, exist_ok=True)
+    start = time.perf_counter()
+    for qname, schema in schemas:
+        write_schema(schema, os.path.join(out_dir, qname + ".yml"))
+    timings["write"] = time.perf_counter() - start
+
+    return timings
+
+
+@click.command()
+@click.option(
+    "--sizes",
+    default="250,500,1000",
+    show_default=True,
+    help="Comma-separated class counts of the synthetic models.",
+)
+@click.option("--repeat", default=3, show_default=True, help="Runs per size. The fastest run per stage is reported.")
+@click.option("--relation-density", default=1.0, show_default=True, help="Associations per class.")
+@click.option("--seed", default=0, show_default=True)
+@click.option(
+    "--output",
+    type=click.Path(dir_okay=False),
+    help="If passed, the results are also written to this file as JSON.",
+)
+def cli(sizes, repeat, relation_density, seed, output):
+    """Times reading, parsing, indexing, generating and writing on synthetic models."""
+
+    results = []
+    click.echo(f"{'classes':>8} " + " ".join(f"{stage:>15}" for stage in STAGES))
+
+    for size in (int(s) for s in sizes.split(",")):
+        model = SyntheticModel(class_count=size, relation_density=relation_density, seed=seed)
+
+        runs = []
+        for _ in range(repeat):
+            with tempfile.TemporaryDirectory() as work_dir:
+                runs.append(bench_model(model, work_dir))
+        best = {stage: min(run[stage] for run in runs) for stage in STAGES}
+
+        results.append({"model": model._asdict(), "timings": best})
+        click.echo(f"{size:>8} " + " ".join(f"{best[stage]:>14.3f}s" for stage in STAGES))
+
+    if output:
+        with open(output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    cli.main()
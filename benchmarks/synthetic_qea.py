@@ -0,0 +1,250 @@
+"""Builds synthetic Sparx EA QEA files for benchmarking.
+
+Only the tables and columns read by `cim_to_linkml.read` are created, populated with
+a randomly generated, but reproducible, CIM-like model.
+"""
+
+import os
+import random
+import sqlite3
+from typing import NamedTuple
+
+import click
+
+PRIMITIVES = ("Boolean", "Date", "DateTime", "Decimal", "Duration", "Float", "Integer", "MonthDay", "String", "Time")
+TIMESTAMP = "2024-01-01 00:00:00"
+
+# Notes as EA often holds them, with Windows line breaks or non-ASCII characters. These
+# are written as double-quoted YAML strings.
+UNUSUAL_NOTES = (
+    "{}\r\nIt spans several lines, separated by the line breaks of Windows.",
+    "{} Its value is given in °C or, where the unit is not known – as in older models – in K.",
+)
+
+
+class SyntheticModel(NamedTuple):
+    class_count: int = 1000
+    package_depth: int = 3
+    packages_per_package: int = 3
+    attributes_per_class: int = 5
+    relation_density: float = 1.0  # Associations per class.
+    generalization_share: float = 0.6  # Share of classes that have a superclass.
+    enum_share: float = 0.1
+    datatype_share: float = 0.05
+    unusual_note_share: float = 0.05  # Share of notes of classes and attributes that are `UNUSUAL_NOTES`.
+    seed: int = 0
+
+
+SCHEMA = """
+CREATE TABLE t_package (
+    Package_ID INTEGER PRIMARY KEY,
+    Name TEXT,
+    Parent_ID INTEGER,
+    CreatedDate TEXT,
+    ModifiedDate TEXT,
+    Notes TEXT
+);
+CREATE TABLE t_object (
+    Object_ID INTEGER PRIMARY KEY,
+    Object_Type TEXT,
+    Name TEXT,
+    Author TEXT,
+    Package_ID INTEGER,
+    CreatedDate TEXT,
+    ModifiedDate TEXT,
+    Stereotype TEXT,
+    Note TEXT
+);
+CREATE TABLE t_attribute (
+    ID INTEGER PRIMARY KEY,
+    Object_ID INTEGER,
+    Name TEXT,
+    LowerBound TEXT,
+    UpperBound TEXT,
+    Type TEXT,
+    Notes TEXT,
+    Stereotype TEXT,
+    "Default" TEXT
+);
+CREATE TABLE t_connector (
+    Connector_ID INTEGER PRIMARY KEY,
+    Connector_Type TEXT,
+    Start_Object_ID INTEGER,
+    End_Object_ID INTEGER,
+    Direction TEXT,
+    SubType TEXT,
+    SourceCard TEXT,
+    SourceRole TEXT,
+    SourceRoleNote TEXT,
+    DestCard TEXT,
+    DestRole TEXT,
+    DestRoleNote TEXT
+);
+"""
+
+
+def build_synthetic_qea(path: os.PathLike | str, model: SyntheticModel = SyntheticModel()) -> None:
+    """Writes a synthetic QEA file for `model` to `path`, replacing any existing file."""
+
+    rnd = random.Random(model.seed)
+    # Kept apart, so the share of unusual notes does not change the rest of the model.
+    notes_rnd = random.Random(f"{model.seed}-notes")
+
+    def get_note(note: str) -> str:
+        if notes_rnd.random() < model.unusual_note_share:
+            return notes_rnd.choice(UNUSUAL_NOTES).format(note)
+        return note
+
+    if os.path.exists(path):
+        os.remove(path)
+
+    with sqlite3.connect(path) as conn:
+        conn.executescript(SCHEMA)
+
+        package_ids = _insert_packages(conn, model)
+        # The root package (`Model`) is not part of qualified names, so classes are not put in it.
+        class_package_ids = package_ids[1:]
+
+        object_ids = iter(range(max(package_ids) + 1, 1 << 62))
+        attribute_ids = iter(range(1, 1 << 62))
+
+        primitives = []
+        for name in PRIMITIVES:
+            primitives.append(_insert_class(conn, next(object_ids), name, class_package_ids[0], "Primitive"))
+
+        enum_count = int(model.class_count * model.enum_share)
+        datatype_count = int(model.class_count * model.datatype_share)
+        class_count = max(model.class_count - enum_count - datatype_count, 1)
+
+        enums = []
+        for i in range(enum_count):
+            class_id = _insert_class(
+                conn, next(object_ids), f"Kind{i}", rnd.choice(class_package_ids), "enumeration", get_note
+            )
+            for j in range(rnd.randint(2, 8)):
+                conn.execute(
+                    "INSERT INTO t_attribute VALUES (?, ?, ?, NULL, NULL, NULL, NULL, 'enum', NULL)",
+                    (next(attribute_ids), class_id, f"literal{j}"),
+                )
+            enums.append(f"Kind{i}")
+
+        datatypes = []
+        for i in range(datatype_count):
+            class_id = _insert_class(
+                conn, next(object_ids), f"Quantity{i}", rnd.choice(class_package_ids), "CIMDatatype"
+            )
+            for name, type_ in (("value", "Float"), ("multiplier", None), ("unit", None)):
+                conn.execute(
+                    "INSERT INTO t_attribute VALUES (?, ?, ?, '0', '1', ?, NULL, NULL, NULL)",
+                    (next(attribute_ids), class_id, name, type_ or (rnd.choice(enums) if enums else "String")),
+                )
+            datatypes.append(f"Quantity{i}")
+
+        attribute_types = PRIMITIVES + tuple(enums) + tuple(datatypes)
+
+        classes = []
+        for i in range(class_count):
+            class_id = _insert_class(conn, next(object_ids), f"Class{i}", rnd.choice(class_package_ids), None, get_note)
+            for j in range(rnd.randint(0, 2 * model.attributes_per_class)):
+                conn.execute(
+                    "INSERT INTO t_attribute VALUES (?, ?, ?, ?, '1', ?, ?, NULL, NULL)",
+                    (
+                        next(attribute_ids),
+                        class_id,
+                        f"attribute{j}",
+                        rnd.choice(("0", "1")),
+                        rnd.choice(attribute_types),
+                        get_note(f"Attribute {j} of class {i}."),
+                    ),
+                )
+            classes.append(class_id)
+
+        connector_ids = iter(range(1, 1 << 62))
+
+        for i, class_id in enumerate(classes[1:], start=1):
+            if rnd.random() < model.generalization_share:
+                conn.execute(
+                    "INSERT INTO t_connector (Connector_ID, Connector_Type, Start_Object_ID, End_Object_ID) "
+                    "VALUES (?, 'Generalization', ?, ?)",
+                    (next(connector_ids), class_id, rnd.choice(classes[:i])),
+                )
+
+        for _ in range(int(class_count * model.relation_density)):
+            connector_id = next(connector_ids)
+            conn.execute(
+                "INSERT INTO t_connector VALUES (?, 'Association', ?, ?, 'Unspecified', NULL, ?, ?, NULL, ?, ?, ?)",
+                (
+                    connector_id,
+                    rnd.choice(classes),
+                    rnd.choice(classes),
+                    rnd.choice(("0..1", "0..*", "1", "1..*")),
+                    f"Source{connector_id}",
+                    rnd.choice(("0..1", "0..*", "1", "1..*")),
+                    f"Destination{connector_id}",
+                    f"Role note of association {connector_id}.",
+                ),
+            )
+
+
+def _insert_packages(conn: sqlite3.Connection, model: SyntheticModel) -> list[int]:
+    package_ids = [1]
+    conn.execute("INSERT INTO t_package VALUES (1, 'Model', 0, ?, ?, NULL)", (TIMESTAMP, TIMESTAMP))
+    conn.execute("INSERT INTO t_package VALUES (2, 'TC57CIM', 1, ?, ?, NULL)", (TIMESTAMP, TIMESTAMP))
+
+    level = [2]
+    package_ids.append(2)
+    for _ in range(model.package_depth):
+        next_level = []
+        for parent_id in level:
+            for i in range(model.packages_per_package):
+                package_id = len(package_ids) + 1
+                conn.execute(
+                    "INSERT INTO t_package VALUES (?, ?, ?, ?, ?, NULL)",
+                    (package_id, f"Package{package_id}", parent_id, TIMESTAMP, TIMESTAMP),
+                )
+                package_ids.append(package_id)
+                next_level.append(package_id)
+        level = next_level
+
+    for package_id in package_ids:
+        conn.execute(
+            "INSERT INTO t_object VALUES (?, 'Package', NULL, 'synthetic', NULL, ?, ?, NULL, ?)",
+            (package_id, TIMESTAMP, TIMESTAMP, f"Notes of package {package_id}."),
+        )
+
+    return package_ids
+
+
+def _insert_class(
+    conn: sqlite3.Connection, class_id: int, name: str, package_id: int, stereotype, get_note=lambda note: note
+) -> int:
+    conn.execute(
+        "INSERT INTO t_object VALUES (?, 'Class', ?, 'synthetic', ?, ?, ?, ?, ?)",
+        (class_id, name, package_id, TIMESTAMP, TIMESTAMP, stereotype, get_note(f"Note of {name}.")),
+    )
+    return class_id
+
+
+_DEFAULTS = SyntheticModel._field_defaults
+
+
+@click.command()
+@click.argument("qea_file", type=click.Path(dir_okay=False))
+@click.option("--classes", "class_count", default=_DEFAULTS["class_count"], show_default=True)
+@click.option("--package-depth", default=_DEFAULTS["package_depth"], show_default=True)
+@click.option("--packages-per-package", default=_DEFAULTS["packages_per_package"], show_default=True)
+@click.option("--attributes-per-class", default=_DEFAULTS["attributes_per_class"], show_default=True)
+@click.option("--relation-density", default=_DEFAULTS["relation_density"], show_default=True)
+@click.option("--generalization-share", default=_DEFAULTS["generalization_share"], show_default=True)
+@click.option("--enum-share", default=_DEFAULTS["enum_share"], show_default=True)
+@click.option("--datatype-share", default=_DEFAULTS["datatype_share"], show_default=True)
+@click.option("--unusual-note-share", default=_DEFAULTS["unusual_note_share"], show_default=True)
+@click.option("--seed", default=_DEFAULTS["seed"], show_default=True)
+def cli(qea_file, **model):
+    """Builds a synthetic QEA file."""
+
+    build_synthetic_qea(qea_file, SyntheticModel(**model))
+
+
+if __name__ == "__main__":
+    cli.main()
@@ -0,0 +1,100 @@
+"""Generating schemas from Python, without going through files.
+
+    >>> from cim_to_linkml.api import generate_schemas, serialize_schemas
+    >>> schemas = generate_schemas("data/cim.qea", "TC57CIM.IEC61970.Base")
+    >>> for qname, content in serialize_schemas(schemas, "json"):
+    ...     store(qname, content)
+"""
+
+import os
+import sqlite3
+from itertools import chain
+from typing import Iterable, Iterator, Optional
+
+import cim_to_linkml.linkml_model as linkml_model
+from cim_to_linkml.generator import GenerationContext, generate_schema, get_import_closure
+from cim_to_linkml.loader import load_uml_project
+from cim_to_linkml.parser import parse_uml_project
+from cim_to_linkml.read import Access, read_uml_project
+from cim_to_linkml.selection import Selection, resolve_selection
+from cim_to_linkml.writer import Format, serialize_schema
+
+
+def generate_schemas(
+    source: os.PathLike | str | sqlite3.Connection,
+    package: str = "TC57CIM",
+    single_schema: bool = False,
+    ignore_subpackages: bool = False,
+    use_imports: bool = False,
+    reproducible: bool = False,
+    cache_dir: Optional[os.PathLike | str] = None,
+    access: Access = "default",
+) -> Iterator[tuple[str, linkml_model.Schema]]:
+    """Generates the schemas for a package, like `cim2linkml` does, yielding them by qualified name.
+
+    The source is the path of a QEA file or a connection to one. A connection is left
+    open, but holds some temporary tables afterwards. Paths are opened as `access`
+    says, see `read.connect`, and the projects read from them are cached in
+    `cache_dir` if one is given.
+
+    Only the part of the project needed for the package is read, or all of it with
+    `use_imports`, which happens right away, as do the checks of the selection. The
+    schemas are generated one by one, as they are iterated over.
+    """
+
+    if use_imports and single_schema:
+        raise ValueError("Imports cannot be combined with a single schema.")
+
+    selection = Selection(package, single_schema, ignore_subpackages)
+
+    # The schemas of the packages imported hold all their classes, not just the ones the selection needs.
+    if isinstance(source, sqlite3.Connection):
+        uml_project = parse_uml_project(
+            *read_uml_project(source, None if use_imports else [(package, ignore_subpackages)])
+        )
+    else:
+        uml_project = load_uml_project(source, None if use_imports else [selection], cache_dir, access=access)
+
+    return iter_schemas(selection, GenerationContext(uml_project, reproducible), use_imports)
+
+
+def iter_schemas(
+    selection: Selection, ctx: GenerationContext, use_imports: bool = False
+) -> Iterator[tuple[str, linkml_model.Schema]]:
+    """Generates the schemas of the selection from the context's project, yielding them by qualified name.
+
+    That is a single schema, named after the selected package, unless the selection
+    creates a schema per package. Raises a `KeyError` for unknown packages right away.
+    """
+
+    uml_project = ctx.uml_project
+    single_schema, uml_packages = resolve_selection(selection, uml_project, use_imports)
+
+    if not single_schema and use_imports:
+        uml_packages = get_import_closure(uml_packages, ctx)
+
+    def generate():
+        if single_schema:
+            uml_package = uml_project.packages.by_qualified_name[selection.package]
+            uml_classes = list(chain.from_iterable(uml_project.classes.by_package.get(p.id, []) for p in uml_packages))
+            yield selection.package, generate_schema(uml_package, uml_classes, uml_project, ctx)
+        else:
+            for uml_package in uml_packages:
+                yield uml_project.packages.get_qualified_name(uml_package.id), generate_schema(
+                    uml_package,
+                    uml_project.classes.by_package.get(uml_package.id, []),
+                    uml_project,
+                    ctx,
+                    use_imports,
+                )
+
+    return generate()
+
+
+def serialize_schemas(
+    schemas: Iterable[tuple[str, linkml_model.Schema]], format: Format = "yaml"
+) -> Iterator[tuple[str, bytes]]:
+    """Serializes the schemas one by one, as they are iterated over."""
+
+    for qname, schema in schemas:
+        yield qname, serialize_schema(schema, format)
@@ -0,0 +1,90 @@
+import hashlib
+import logging
+import os
+import pickle
+from pathlib import Path
+from typing import Optional
+
+import cim_to_linkml.uml_model as uml_model
+
+# Bump whenever the parsed representation changes, so stale caches are not loaded.
+CACHE_VERSION = 3
+
+logger = logging.getLogger(__name__)
+
+
+def get_default_cache_dir() -> Path:
+    return Path(os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache") / "cim2linkml"
+
+
+def fingerprint_qea_file(qea_file: uml_model.QEAFile) -> str:
+    """Fingerprints the QEA file by its size, modification time and contents."""
+
+    stat = os.stat(qea_file)
+    digest = hashlib.sha256(f"{CACHE_VERSION}:{stat.st_size}:{stat.st_mtime_ns}:".encode())
+
+    with open(qea_file, "rb") as f:
+        while chunk := f.read(1 << 20):
+            digest.update(chunk)
+
+    return digest.hexdigest()
+
+
+def load_project(
+    qea_file: uml_model.QEAFile, cache_dir: os.PathLike | str, fingerprint: str, selection: str = ""
+) -> Optional[uml_model.Project]:
+    """Loads the parsed project of the QEA file from the cache, if there is an entry for its fingerprint.
+
+    Projects read for a package selection are cached separately per selection.
+    """
+
+    cache_file = _get_cache_file(qea_file, cache_dir, fingerprint, selection)
+
+    try:
+        with open(cache_file, "rb") as f:
+            uml_project = pickle.load(f)
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        logger.warning(f"Ignoring unreadable project cache `{cache_file}': {e}")
+        return None
+
+    if not isinstance(uml_project, uml_model.Project):
+        logger.warning(f"Ignoring invalid project cache `{cache_file}'.")
+        return None
+
+    return uml_project
+
+
+def save_project(
+    uml_project: uml_model.Project,
+    qea_file: uml_model.QEAFile,
+    cache_dir: os.PathLike | str,
+    fingerprint: str,
+    selection: str = "",
+) -> None:
+    """Caches the parsed project, including its indexes, replacing older entries for the same QEA file and selection."""
+
+    cache_file = _get_cache_file(qea_file, cache_dir, fingerprint, selection)
+    os.makedirs(cache_dir, exist_ok=True)
+
+    uml_project.build_indexes()
+
+    tmp_file = cache_file.with_suffix(".tmp")
+    with open(tmp_file, "wb") as f:
+        pickle.dump(uml_project, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_file, cache_file)
+
+    for old_cache_file in Path(cache_dir).glob(f"{_get_path_key(qea_file, selection)}-*.pickle"):
+        if old_cache_file != cache_file:
+            old_cache_file.unlink(missing_ok=True)
+
+
+def _get_path_key(qea_file: uml_model.QEAFile, selection: str) -> str:
+    return hashlib.sha256(os.fsencode(os.path.abspath(qea_file)) + b"\0" + selection.encode()).hexdigest()[:16]
+
+
+def _get_cache_file(
+    qea_file: uml_model.QEAFile, cache_dir: os.PathLike | str, fingerprint: str, selection: str
+) -> Path:
+    return Path(cache_dir) / f"{_get_path_key(qea_file, selection)}-{fingerprint}.pickle"
@@ -1,6 +1,9 @@
-from datetime import datetime
-from functools import lru_cache
-from typing import Optional
+import os
+import posixpath
+from collections import Counter
+from datetime import datetime, timezone
+from functools import wraps
+from typing import Iterable, Iterator, NamedTuple, Optional
 from urllib.parse import quote
 
 import cim_to_linkml.linkml_model as linkml_model
@@ -11,16 +14,130 @@ GITHUB_BASE_URL = "https://github.com/"
 GITHUB_REPO_URL = "https://github.com/bartkl/cim-to-linkml"
 
 
+class CacheStats(NamedTuple):
+    hits: int
+    misses: int
+    size: int
+
+
+class GenerationContext:
+    """Memo tables for generating schemas from a single UML project.
+
+    The tables grow with the project instead of being capped at a fixed size, and they
+    live exactly as long as the context does. Share one context between all schemas
+    generated from the same project, and clear it (or leave the `with` block) once done
+    so the project can be garbage collected.
+
+    All schemas generated in a context share its generation date. For reproducible
+    output, see `get_generation_date`.
+    """
+
+    def __init__(self, uml_project: uml_model.Project, reproducible: bool = False) -> None:
+        self.uml_project = uml_project
+        self.generation_date = get_generation_date(reproducible)
+        self._memos: dict[str, dict] = {}
+        self.hits: Counter[str] = Counter()
+        self.misses: Counter[str] = Counter()
+
+    def __enter__(self) -> "GenerationContext":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.clear()
+
+    def clear(self) -> None:
+        self._memos.clear()
+        self.hits.clear()
+        self.misses.clear()
+
+    def stats(self) -> dict[str, CacheStats]:
+        return {
+            name: CacheStats(hits=self.hits[name], misses=self.misses[name], size=len(memo))
+            for name, memo in self._memos.items()
+        }
+
+
+def get_generation_date(reproducible: bool = False) -> Optional[datetime]:
+    """Returns the date to stamp generated schemas with.
+
+    That is the current time, unless the output should be reproducible. The date is
+    then taken from `$SOURCE_DATE_EPOCH` if set (see https://reproducible-builds.org/),
+    and omitted otherwise. Raises a `ValueError` if it is not a number of seconds.
+    """
+
+    if not reproducible:
+        return datetime.now()
+
+    source_date_epoch = os.environ.get("SOURCE_DATE_EPOCH")
+    if source_date_epoch is None:
+        return None
+
+    try:
+        return datetime.fromtimestamp(int(source_date_epoch), timezone.utc)
+    except (ValueError, OverflowError, OSError):
+        raise ValueError(
+            f"Invalid $SOURCE_DATE_EPOCH: `{source_date_epoch}'. It should be a number of seconds since the epoch."
+        ) from None
+
+
+def _memoized(func):
+    """Memoizes a `(uml_class, ctx)` function per generation context, keyed by class ID."""
+
+    name = func.__name__
+
+    @wraps(func)
+    def wrapper(uml_class: uml_model.Class, ctx: GenerationContext):
+        memo = ctx._memos.setdefault(name, {})
+        try:
+            result = memo[uml_class.id]
+        except KeyError:
+            ctx.misses[name] += 1
+            result = memo[uml_class.id] = func(uml_class, ctx)
+        else:
+            ctx.hits[name] += 1
+        return result
+
+    return wrapper
+
+
 def generate_schema(
-    uml_package: uml_model.Package, uml_classes: list[uml_model.Class], uml_project: uml_model.Project
+    uml_package: uml_model.Package,
+    uml_classes: list[uml_model.Class],
+    uml_project: uml_model.Project,
+    ctx: Optional[GenerationContext] = None,
+    use_imports: bool = False,
 ) -> linkml_model.Schema:
-    classes = {}
-    enums = {}
+    """Generates the schema of the package, holding the given classes.
+
+    By default, everything the classes (transitively) depend on is included in the
+    schema as well, so it stands on its own. With `use_imports`, the schema holds the
+    given classes only, and imports the schemas of the packages of the classes they
+    refer to. Imports are relative to the per-package layout of the output, in which
+    the schema of e.g. `TC57CIM.IEC61970.Base.Core` is at `TC57CIM/IEC61970/Base/Core.yaml`,
+    and leave out the extension, as LinkML adds it.
+    """
 
-    for uml_class in uml_classes:
-        _classes, _enums = _generate_elements_for_class(uml_class, uml_project)
-        classes.update(_classes)
-        enums.update(_enums)
+    if ctx is None:
+        ctx = GenerationContext(uml_project)
+    elif ctx.uml_project is not uml_project:
+        raise ValueError("Generation context belongs to a different UML project.")
+
+    imports = ["linkml:types"]
+
+    if use_imports:
+        classes, enums = _generate_elements(uml_classes, ctx)
+        imports.extend(
+            _generate_import(uml_package, uml_imported_package, uml_project)
+            for uml_imported_package in get_imported_packages(uml_package, uml_classes, ctx)
+        )
+    else:
+        classes = {}
+        enums = {}
+
+        for uml_class in uml_classes:
+            _classes, _enums = _generate_elements_for_class(uml_class, ctx)
+            classes.update(_classes)
+            enums.update(_enums)
 
     schema = linkml_model.Schema(
         id=_generate_schema_id(uml_package, uml_project),
@@ -29,10 +146,10 @@ def generate_schema(
         description=uml_package.notes,
         contributors=["github:bartkl"],
         created_by=GITHUB_REPO_URL,
-        generation_date=datetime.now(),
+        generation_date=ctx.generation_date,
         license="https://www.apache.org/licenses/LICENSE-2.0.txt",
         metamodel_version=LINKML_METAMODEL_VERSION,
-        imports=["linkml:types"],
+        imports=imports,
         prefixes={
             "linkml": "https://w3id.org/linkml/",
             "github": "https://github.com/",
@@ -48,55 +165,127 @@ def generate_schema(
     return schema
 
 
-def _generate_elements_for_class(
-    uml_class: uml_model.Class, uml_project: uml_model.Project, results: tuple[dict, dict] | None = None
-) -> tuple[dict, dict]:
+def _generate_elements_for_class(uml_class: uml_model.Class, ctx: GenerationContext) -> tuple[dict, dict]:
     """Generates the class or enum and its dependencies.
 
-    This method does the heavy lifting. It recursively traverses all dependencies
-    of the given UML class, e.g. its ancestor classes, associated classes and
-    enum types, etc. Every class dependency is either a class or enum class, and
-    once generated to LinkML elements they are accumulated and ultimately returend
-    in `results`
+    This method does the heavy lifting. It traverses all dependencies of the given
+    UML class, e.g. its ancestor classes, associated classes and enum types, etc.
+    Every class dependency is either a class or enum class, and once generated to
+    LinkML elements they are accumulated and ultimately returned as a tuple of
+    classes and enums.
+    """
+
+    return _generate_elements(_walk_dependencies(uml_class, ctx), ctx)
+
+
+def _generate_elements(uml_classes: Iterable[uml_model.Class], ctx: GenerationContext) -> tuple[dict, dict]:
+    classes = {}
+    enums = {}
+
+    for uml_class in uml_classes:
+        match uml_class.stereotype:
+            case uml_model.ClassStereotype.PRIMITIVE:
+                # TODO: Log.
+                continue
+            case uml_model.ClassStereotype.ENUMERATION:
+                enums[uml_class.name] = generate_enum_class(uml_class, ctx)
+            case uml_model.ClassStereotype.CIMDATATYPE:
+                classes[uml_class.name] = generate_class(uml_class, ctx)
+            case None | _:
+                classes[uml_class.name] = generate_class(uml_class, ctx)
+
+    return classes, enums
+
+
+def get_imported_packages(
+    uml_package: uml_model.Package, uml_classes: list[uml_model.Class], ctx: GenerationContext
+) -> list[uml_model.Package]:
+    """Returns the packages whose schemas the package's schema imports when using imports.
+
+    These are the packages of the classes the given classes refer to, sorted by
+    qualified name.
     """
 
-    if results is None:
-        results = {}, {}
-
-    match uml_class.stereotype:
-        case uml_model.ClassStereotype.PRIMITIVE:
-            # TODO: Log.
-            return results
-        case uml_model.ClassStereotype.ENUMERATION:
-            enum = generate_enum_class(uml_class, uml_project)
-            results[1][uml_class.name] = enum
-        case uml_model.ClassStereotype.CIMDATATYPE:
-            class_ = generate_class(uml_class, uml_project)
-            results[0][uml_class.name] = class_
-        case None | _:
-            class_ = generate_class(uml_class, uml_project)
-            results[0][uml_class.name] = class_
-
-    uml_dep_classes = tuple()  # TODO: Now duplicates can be stored. Improve this.
-
-    uml_super_class = _get_super_class(uml_class, uml_project)
-    if uml_super_class:
-        uml_dep_classes = uml_dep_classes + (uml_super_class,)
-
-    uml_dep_classes = (
-        uml_dep_classes + _get_attribute_types(uml_class, uml_project) + _get_related_classes(uml_class, uml_project)
+    uml_project = ctx.uml_project
+    package_ids = {
+        uml_ref_class.package for uml_class in uml_classes for uml_ref_class in _get_referenced_classes(uml_class, ctx)
+    }
+    package_ids.discard(uml_package.id)
+
+    return sorted(
+        (uml_project.packages.by_id[package_id] for package_id in package_ids),
+        key=lambda p: uml_project.packages.get_qualified_name(p.id),
     )
 
-    for uml_dep_class in uml_dep_classes:
-        if uml_dep_class.name in results[0]:
+
+def get_import_closure(uml_packages: list[uml_model.Package], ctx: GenerationContext) -> list[uml_model.Package]:
+    """Returns the given packages and the packages their schemas (transitively) import, sorted by ID."""
+
+    uml_project = ctx.uml_project
+    package_ids = {p.id for p in uml_packages}
+
+    worklist = list(uml_packages)
+    while worklist:
+        uml_package = worklist.pop()
+        uml_classes = uml_project.classes.by_package.get(uml_package.id, [])
+        for uml_imported_package in get_imported_packages(uml_package, uml_classes, ctx):
+            if uml_imported_package.id not in package_ids:
+                package_ids.add(uml_imported_package.id)
+                worklist.append(uml_imported_package)
+
+    return [uml_project.packages.by_id[package_id] for package_id in sorted(package_ids)]
+
+
+def get_dependency_closure(uml_classes: list[uml_model.Class], ctx: GenerationContext) -> list[uml_model.Class]:
+    """Returns the given classes and everything they transitively depend on, each once."""
+
+    closure = {}
+    for uml_class in uml_classes:
+        for uml_dep_class in _walk_dependencies(uml_class, ctx):
+            closure.setdefault(uml_dep_class.id, uml_dep_class)
+
+    return list(closure.values())
+
+
+def _walk_dependencies(uml_class: uml_model.Class, ctx: GenerationContext) -> Iterator[uml_model.Class]:
+    """Yields the class and its dependencies, depth-first.
+
+    The traversal uses an explicit worklist rather than recursion, so deep dependency
+    chains cannot exhaust the stack. Every element, whatever its kind, is visited only
+    once. Primitives are yielded, but not expanded.
+    """
+
+    visited = set()
+
+    worklist = [uml_class]
+    while worklist:
+        uml_class = worklist.pop()
+        if uml_class.name in visited:
             continue
-        results = _generate_elements_for_class(uml_dep_class, uml_project, results)
-    return results
+        visited.add(uml_class.name)
+
+        yield uml_class
+
+        if uml_class.stereotype == uml_model.ClassStereotype.PRIMITIVE:
+            continue
+
+        uml_dep_classes = []
+
+        uml_super_class = _get_super_class(uml_class, ctx)
+        if uml_super_class:
+            uml_dep_classes.append(uml_super_class)
+
+        uml_dep_classes.extend(_get_attribute_types(uml_class, ctx))
+        uml_dep_classes.extend(_get_related_classes(uml_class, ctx))
 
+        # Pushed in reverse, so dependencies are visited in their listed order.
+        worklist.extend(dep for dep in reversed(uml_dep_classes) if dep.name not in visited)
 
-@lru_cache(maxsize=1942)
-def generate_class(uml_class: uml_model.Class, uml_project: uml_model.Project) -> linkml_model.Class:
-    super_class = _get_super_class(uml_class, uml_project)
+
+@_memoized
+def generate_class(uml_class: uml_model.Class, ctx: GenerationContext) -> linkml_model.Class:
+    uml_project = ctx.uml_project
+    super_class = _get_super_class(uml_class, ctx)
     package = uml_project.packages.by_id[uml_class.package]
 
     attr_slots = tuple(
@@ -107,15 +296,13 @@ def generate_class(uml_class: uml_model.Class, uml_project: uml_model.Project) -
 
     from_relation_slots = tuple(
         slot
-        for rel in uml_project.relations.by_source_class.get(uml_class.id, [])
-        if rel and rel.type != uml_model.RelationType.GENERALIZATION
+        for rel in uml_project.relations.associations_by_source_class.get(uml_class.id, [])
         if (slot := generate_slot_from_relation(rel, uml_project, "source->dest"))
     )
 
     to_relation_slots = tuple(
         slot
-        for rel in uml_project.relations.by_dest_class.get(uml_class.id, [])
-        if rel and rel.type != uml_model.RelationType.GENERALIZATION
+        for rel in uml_project.relations.associations_by_dest_class.get(uml_class.id, [])
         if (slot := generate_slot_from_relation(rel, uml_project, "dest->source"))
     )
 
@@ -136,9 +323,10 @@ def generate_class(uml_class: uml_model.Class, uml_project: uml_model.Project) -
     return class_
 
 
-@lru_cache(maxsize=1942)
-def generate_enum_class(uml_enum: uml_model.Class, uml_project: uml_model.Project) -> linkml_model.Enum:
+@_memoized
+def generate_enum_class(uml_enum: uml_model.Class, ctx: GenerationContext) -> linkml_model.Enum:
     assert uml_enum.stereotype == uml_model.ClassStereotype.ENUMERATION
+    uml_project = ctx.uml_project
     package = uml_project.packages.by_id[uml_enum.package]
 
     return linkml_model.Enum(
@@ -221,6 +409,27 @@ def _generate_schema_id(uml_package: uml_model.Package, uml_project: uml_model.P
     return linkml_model.CIM_BASE_URI + qname
 
 
+def _generate_import(
+    uml_package: uml_model.Package, uml_imported_package: uml_model.Package, uml_project: uml_model.Project
+) -> str:
+    """
+    Example:
+    TC57CIM.IEC61970.Base.Wires importing TC57CIM.IEC61970.Domain
+        ->
+    ../Domain
+    """
+
+    package_path = uml_project.packages.get_qualified_name(uml_package.id).split(".")
+    imported_package_path = uml_project.packages.get_qualified_name(uml_imported_package.id).split(".")
+
+    import_dir = posixpath.relpath(
+        posixpath.join(".", *imported_package_path[:-1]), posixpath.join(".", *package_path[:-1])
+    )
+    import_path = posixpath.join(import_dir, imported_package_path[-1])
+
+    return import_path if import_path.startswith(("./", "../")) else "./" + import_path
+
+
 def _map_primitive_data_type(val):
     try:
         return {
@@ -243,26 +452,19 @@ def _generate_curie(name: str, prefix: str) -> str:
     return f"{prefix}:{quote(name)}"
 
 
-@lru_cache(maxsize=1947)
-def _get_super_class(uml_class: uml_model.Class, uml_project: uml_model.Project) -> Optional[uml_model.Class]:
-    rels = uml_project.relations.by_source_class.get(uml_class.id, [])
-    for uml_relation in rels:
-        if uml_relation.type != uml_model.RelationType.GENERALIZATION:
-            continue
-
-        try:
-            source_class = uml_project.classes.by_id[uml_relation.source_class]
-        except KeyError as e:
-            continue  # Bad data, but no superclass for sure.
+@_memoized
+def _get_super_class(uml_class: uml_model.Class, ctx: GenerationContext) -> Optional[uml_model.Class]:
+    uml_project = ctx.uml_project
+    uml_relation = uml_project.relations.generalization_by_source_class.get(uml_class.id)
+    if uml_relation is None:
+        return None
 
-        if source_class.id == uml_class.id:
-            super_class = uml_project.classes.by_id[uml_relation.dest_class]
-            return super_class
-    return None
+    return uml_project.classes.by_id[uml_relation.dest_class]
 
 
-@lru_cache(maxsize=1942)
-def _get_attribute_types(uml_class: uml_model.Class, uml_project: uml_model.Project) -> tuple[uml_model.Class]:
+@_memoized
+def _get_attribute_types(uml_class: uml_model.Class, ctx: GenerationContext) -> tuple[uml_model.Class, ...]:
+    uml_project = ctx.uml_project
     type_classes = tuple(
         class_
         for attr in uml_class.attributes
@@ -273,23 +475,32 @@ def _get_attribute_types(uml_class: uml_model.Class, uml_project: uml_model.Proj
     return type_classes
 
 
-@lru_cache(maxsize=1942)
-def _get_related_classes(uml_class: uml_model.Class, uml_project: uml_model.Project) -> tuple[uml_model.Class]:
-    from_classes = tuple()
-    to_classes = tuple()
+@_memoized
+def _get_related_classes(uml_class: uml_model.Class, ctx: GenerationContext) -> tuple[uml_model.Class, ...]:
+    uml_project = ctx.uml_project
+    neighbours = uml_project.relations.neighbours.get(uml_class.id, uml_model.Neighbours())
 
-    for rel in uml_project.relations.by_id.values():
-        if rel.type == uml_model.RelationType.GENERALIZATION:
-            continue
-        match uml_class.id:
-            case rel.source_class:
-                dest_class = uml_project.classes.by_id[rel.dest_class]
-                to_classes = to_classes + (dest_class,)
-            case rel.dest_class:
-                source_class = uml_project.classes.by_id[rel.source_class]
-                from_classes = from_classes + (source_class,)
-
-    return from_classes + to_classes
+    return tuple(uml_project.classes.by_id[class_id] for class_id in neighbours.incoming + neighbours.outgoing)
+
+
+@_memoized
+def _get_referenced_classes(uml_class: uml_model.Class, ctx: GenerationContext) -> tuple[uml_model.Class, ...]:
+    """Returns the classes the generated class refers to by name: its super class and the ranges of its slots."""
+
+    if uml_class.stereotype in (uml_model.ClassStereotype.PRIMITIVE, uml_model.ClassStereotype.ENUMERATION):
+        return ()
+
+    uml_super_class = _get_super_class(uml_class, ctx)
+
+    return (
+        ((uml_super_class,) if uml_super_class else ())
+        + tuple(
+            type_class
+            for type_class in _get_attribute_types(uml_class, ctx)
+            if type_class.stereotype != uml_model.ClassStereotype.PRIMITIVE
+        )
+        + _get_related_classes(uml_class, ctx)
+    )
 
 
 def _is_slot_required(lower_bound: uml_model.CardinalityValue) -> bool:
@@ -0,0 +1,88 @@
+import hashlib
+import json
+import os
+from operator import attrgetter
+
+import cim_to_linkml.uml_model as uml_model
+from cim_to_linkml.generator import LINKML_METAMODEL_VERSION, GenerationContext, get_dependency_closure
+
+MANIFEST_FILE_NAME = ".cim2linkml-manifest.json"
+MANIFEST_VERSION = 1
+
+Manifest = dict[str, str]  # Schema file path, relative to the output directory -> fingerprint.
+
+
+def load_manifest(output_dir: os.PathLike | str) -> Manifest:
+    """Loads the manifest of the previous run, or an empty one if there is none (or it is unusable)."""
+
+    try:
+        with open(os.path.join(output_dir, MANIFEST_FILE_NAME)) as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+    if not isinstance(data, dict) or data.get("version") != MANIFEST_VERSION:
+        return {}
+
+    return data.get("schemas", {})
+
+
+def save_manifest(manifest: Manifest, output_dir: os.PathLike | str) -> None:
+    manifest_path = os.path.join(output_dir, MANIFEST_FILE_NAME)
+    tmp_path = manifest_path + ".tmp"
+
+    with open(tmp_path, "w") as f:
+        json.dump({"version": MANIFEST_VERSION, "schemas": dict(sorted(manifest.items()))}, f, indent=2)
+    os.replace(tmp_path, manifest_path)
+
+
+def fingerprint_schema(
+    uml_package: uml_model.Package,
+    uml_classes: list[uml_model.Class],
+    ctx: GenerationContext,
+    use_imports: bool = False,
+) -> str:
+    """Fingerprints everything a schema is generated from.
+
+    That is the package itself and the modification dates of its member classes and
+    all classes they transitively reference, together with the packages these belong
+    to, and all fields (roles, role notes, cardinalities, direction) of the relations
+    starting or ending at them. Classes or relations entering or leaving the closure
+    change the fingerprint as well, and so does switching between inlining and
+    importing dependencies.
+    """
+
+    uml_project = ctx.uml_project
+    digest = hashlib.sha256()
+
+    def update(*vals):
+        digest.update("\x1f".join(str(v) for v in vals).encode())
+        digest.update(b"\x1e")
+
+    update(LINKML_METAMODEL_VERSION, use_imports)
+    update(
+        uml_project.packages.get_qualified_name(uml_package.id),
+        uml_package.modified_date.isoformat(),
+        *(uml_class.id for uml_class in uml_classes),
+    )
+    for uml_class in sorted(get_dependency_closure(uml_classes, ctx), key=attrgetter("id")):
+        update(
+            uml_class.id,
+            uml_class.modified_date.isoformat(),
+            uml_project.packages.get_qualified_name(uml_class.package),
+        )
+        # Editing a relation leaves the modification dates of its classes alone.
+        for rel in uml_project.relations.by_source_class.get(uml_class.id, []):
+            update("outgoing", *rel)
+        for rel in uml_project.relations.by_dest_class.get(uml_class.id, []):
+            update("incoming", *rel)
+
+    return digest.hexdigest()
+
+
+def is_up_to_date(manifest: Manifest, output_dir: os.PathLike | str, out_file: str, fingerprint: str) -> bool:
+    return manifest.get(os.path.relpath(out_file, output_dir)) == fingerprint and os.path.exists(out_file)
+
+
+def record_fingerprint(manifest: Manifest, output_dir: os.PathLike | str, out_file: str, fingerprint: str) -> None:
+    manifest[os.path.relpath(out_file, output_dir)] = fingerprint
@@ -0,0 +1,220 @@
+"""A UML project that is read from the QEA file as it is used, rather than all up front.
+
+Only the keys of the classes and relations (IDs, names, types, and the classes and
+packages they belong to) are read when opening the project. Classes and relations
+themselves are read and parsed on first access, and only the most recently used ones
+are kept. Memory then depends on what schema generation visits, not on the size of
+the model. Packages are few and small, so they are read right away.
+
+    >>> with LazyProject("data/cim.qea") as uml_project:
+    ...     wires = uml_project.packages.by_qualified_name["TC57CIM.IEC61970.Base.Wires"]
+    ...     schema = generate_schema(wires, uml_project.classes.by_package[wires.id], uml_project)
+"""
+
+import sqlite3
+from collections import OrderedDict
+from collections.abc import Callable, Collection, Mapping
+from itertools import groupby
+from operator import itemgetter
+
+import cim_to_linkml.uml_model as uml_model
+from cim_to_linkml.parser import parse_uml_class, parse_uml_package, parse_uml_relation
+from cim_to_linkml.read import (
+    Access,
+    connect,
+    read_uml_attribute_keys,
+    read_uml_class_by_id,
+    read_uml_class_keys,
+    read_uml_packages,
+    read_uml_relation_keys,
+    read_uml_relations_by_id,
+)
+from cim_to_linkml.uml_model import RelationType
+
+DEFAULT_CACHE_SIZE = 16384
+
+
+class LazyIndex(Mapping):
+    """A read-only mapping whose values are resolved on first access, keeping the `maxsize` most recently used."""
+
+    def __init__(self, keys: Collection, resolve: Callable, maxsize: int = DEFAULT_CACHE_SIZE) -> None:
+        self._keys = keys
+        self._resolve = resolve
+        self._maxsize = maxsize
+        self._cache = OrderedDict()
+
+    def __getitem__(self, key):
+        try:
+            value = self._cache[key]
+        except KeyError:
+            pass
+        else:
+            self._cache.move_to_end(key)
+            return value
+
+        if key not in self._keys:
+            raise KeyError(key)
+
+        value = self._cache[key] = self._resolve(key)
+        if len(self._cache) > self._maxsize:
+            self._cache.popitem(last=False)
+
+        return value
+
+    def __contains__(self, key) -> bool:
+        return key in self._keys
+
+    def __iter__(self):
+        return iter(self._keys)
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+
+class LazyClasses:
+    """Looks up classes like `uml_model.Classes`, reading them from the QEA file when first needed."""
+
+    def __init__(self, conn: sqlite3.Connection, cache_size: int = DEFAULT_CACHE_SIZE) -> None:
+        self._conn = conn
+
+        ids_by_name = {}
+        self._ids_by_package = {}
+        for class_id, name, package_id in read_uml_class_keys(conn):
+            ids_by_name.setdefault(name, []).append(class_id)
+            self._ids_by_package.setdefault(package_id, []).append(class_id)
+
+        # Like `uml_model.Classes.by_name`, the class with the lowest ID wins.
+        self._ids_by_name = {}
+        for name, class_ids in ids_by_name.items():
+            if len(class_ids) > 1:
+                print(
+                    f"Multiple classes with name {name}. Choosing one (object ID: {class_ids[0]}) "
+                    f"and skipping the others (object IDs: {', '.join(str(c_id) for c_id in class_ids[1:])})."
+                )
+            self._ids_by_name[name] = class_ids[0]
+
+        self._attribute_ids = {
+            class_id: [attr_id for _, attr_id in rows]
+            for class_id, rows in groupby(read_uml_attribute_keys(conn), itemgetter(0))
+        }
+
+        class_ids = {class_id for class_ids in self._ids_by_package.values() for class_id in class_ids}
+        self.by_id = LazyIndex(class_ids, self._read_class, cache_size)
+        self.by_name = LazyIndex(self._ids_by_name, lambda name: self.by_id[self._ids_by_name[name]], cache_size)
+        self.by_package = LazyIndex(
+            self._ids_by_package,
+            lambda package_id: [self.by_id[class_id] for class_id in self._ids_by_package[package_id]],
+            cache_size,
+        )
+
+    def _read_class(self, class_id: uml_model.ObjectID) -> uml_model.Class:
+        return parse_uml_class(read_uml_class_by_id(self._conn, class_id, self._attribute_ids.get(class_id, ())))
+
+
+class LazyRelations:
+    """Looks up relations like `uml_model.Relations`, reading them from the QEA file when first needed."""
+
+    def __init__(self, conn: sqlite3.Connection, cache_size: int = DEFAULT_CACHE_SIZE) -> None:
+        self._conn = conn
+        self._cardinalities = {}
+
+        self._relation_keys = {}
+        self._ids_by_source_class = {}
+        self._ids_by_dest_class = {}
+        self._generalization_ids = {}
+        for relation_id, type_, source_class, dest_class in read_uml_relation_keys(conn):
+            type_ = RelationType(type_)
+            self._relation_keys[relation_id] = (type_, source_class, dest_class)
+            self._ids_by_source_class.setdefault(source_class, []).append(relation_id)
+            self._ids_by_dest_class.setdefault(dest_class, []).append(relation_id)
+            if type_ == RelationType.GENERALIZATION:
+                self._generalization_ids.setdefault(source_class, relation_id)
+
+        self.by_id = LazyIndex(
+            self._relation_keys, lambda relation_id: self._read_relations([relation_id])[0], cache_size
+        )
+        self.by_source_class = LazyIndex(
+            self._ids_by_source_class,
+            lambda class_id: self._read_relations(self._ids_by_source_class[class_id]),
+            cache_size,
+        )
+        self.by_dest_class = LazyIndex(
+            self._ids_by_dest_class,
+            lambda class_id: self._read_relations(self._ids_by_dest_class[class_id]),
+            cache_size,
+        )
+        self.associations_by_source_class = LazyIndex(
+            self._ids_by_source_class,
+            lambda class_id: [r for r in self.by_source_class[class_id] if r.type != RelationType.GENERALIZATION],
+            cache_size,
+        )
+        self.associations_by_dest_class = LazyIndex(
+            self._ids_by_dest_class,
+            lambda class_id: [r for r in self.by_dest_class[class_id] if r.type != RelationType.GENERALIZATION],
+            cache_size,
+        )
+        self.generalization_by_source_class = LazyIndex(
+            self._generalization_ids, lambda class_id: self.by_id[self._generalization_ids[class_id]], cache_size
+        )
+        # Neighbours only need the keys, so no relations are read for them.
+        self.neighbours = LazyIndex(
+            self._ids_by_source_class.keys() | self._ids_by_dest_class.keys(), self._get_neighbours, cache_size
+        )
+
+    def _read_relations(self, relation_ids: list[uml_model.ConnectorID]) -> list[uml_model.Relation]:
+        return [
+            parse_uml_relation(row, self._cardinalities) for row in read_uml_relations_by_id(self._conn, relation_ids)
+        ]
+
+    def _get_neighbours(self, class_id: uml_model.ObjectID) -> uml_model.Neighbours:
+        # Like `uml_model.Relations.neighbours`, a relation from a class to itself only counts as outgoing.
+        outgoing = []
+        for relation_id in self._ids_by_source_class.get(class_id, ()):
+            type_, _, dest_class = self._relation_keys[relation_id]
+            if type_ != RelationType.GENERALIZATION:
+                outgoing.append(dest_class)
+
+        incoming = []
+        for relation_id in self._ids_by_dest_class.get(class_id, ()):
+            type_, source_class, _ = self._relation_keys[relation_id]
+            if type_ != RelationType.GENERALIZATION and source_class != class_id:
+                incoming.append(source_class)
+
+        return uml_model.Neighbours(incoming=tuple(incoming), outgoing=tuple(outgoing))
+
+
+class LazyProject(uml_model.Project):
+    """A UML project that keeps the QEA file open, and reads its classes and relations as they are used.
+
+    It is pickled as the path of the QEA file, so a process it is sent to opens the
+    file itself. Lookups are not thread-safe. Close it (or leave the `with` block)
+    once done.
+    """
+
+    def __init__(
+        self, qea_file: uml_model.QEAFile, cache_size: int = DEFAULT_CACHE_SIZE, access: Access = "default"
+    ) -> None:
+        self.qea_file = qea_file
+        self.cache_size = cache_size
+        self.access = access
+        # Lookups may happen on other threads than the one opening the project, e.g. in
+        # `serve`, but never at the same time.
+        self._conn = connect(qea_file, access, check_same_thread=False)
+
+        super().__init__(
+            packages=uml_model.Packages([parse_uml_package(row) for row in read_uml_packages(self._conn)]),
+            classes=LazyClasses(self._conn, cache_size),
+            relations=LazyRelations(self._conn, cache_size),
+        )
+
+    def __enter__(self) -> "LazyProject":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def __reduce__(self):
+        return type(self), (self.qea_file, self.cache_size, self.access)
+
+    def close(self) -> None:
+        self._conn.close()
@@ -0,0 +1,66 @@
+import os
+from contextlib import closing
+from typing import Optional
+
+from cim_to_linkml.cache import fingerprint_qea_file, get_default_cache_dir, load_project, save_project
+from cim_to_linkml.metrics import Metrics
+from cim_to_linkml.parser import parse_uml_project
+from cim_to_linkml.read import Access, connect, read_uml_project
+from cim_to_linkml.selection import Selection
+from cim_to_linkml.uml_model import Project
+
+
+def load_uml_project(
+    cim_db: os.PathLike | str,
+    selections: Optional[list[Selection]] = None,
+    cache_dir: Optional[os.PathLike | str] = get_default_cache_dir(),
+    no_cache: bool = False,
+    metrics: Optional[Metrics] = None,
+    access: Access = "default",
+) -> Project:
+    """Loads the UML project from the QEA file, or from the cache.
+
+    Only the parts needed for the given selections are read, or the entire project if
+    there are none. Nothing is cached without a cache directory.
+    """
+
+    if metrics is None:
+        metrics = Metrics()
+
+    if no_cache or cache_dir is None:
+        return _read_uml_project(cim_db, selections, metrics, access)
+
+    # Only the selected packages and their dependencies are read from the QEA file.
+    selection = "" if selections is None else "; ".join(sorted({s.describe() for s in selections}))
+
+    with metrics.stage("load_cache"):
+        qea_fingerprint = fingerprint_qea_file(cim_db)
+        uml_project = load_project(cim_db, cache_dir, qea_fingerprint, selection)
+    metrics.caches["project"] = {"hit": uml_project is not None}
+
+    if uml_project is None:
+        uml_project = _read_uml_project(cim_db, selections, metrics, access)
+        with metrics.stage("save_cache"):
+            save_project(uml_project, cim_db, cache_dir, qea_fingerprint, selection)
+
+    return uml_project
+
+
+def _read_uml_project(
+    cim_db: os.PathLike | str, selections: Optional[list[Selection]], metrics: Metrics, access: Access
+) -> Project:
+    with metrics.stage("connect"):
+        conn = connect(cim_db, access)
+    with closing(conn):
+        # The cursors are consumed lazily, so fetching the rows is part of parsing.
+        with metrics.stage("read"):
+            uml_results = read_uml_project(
+                conn, None if selections is None else [(s.package, s.ignore_subpackages) for s in selections]
+            )
+        with metrics.stage("parse"):
+            uml_project = parse_uml_project(*uml_results)
+
+    with metrics.stage("index"):
+        uml_project.build_indexes()
+
+    return uml_project
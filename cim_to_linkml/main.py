@@ -1,24 +1,55 @@
 import cProfile
 import logging
 import os
-import sqlite3
-from itertools import chain
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+from datetime import datetime
+from itertools import chain, repeat
 from pathlib import Path
+from typing import Optional, get_args
 
 import click
 
-from cim_to_linkml.generator import generate_schema
-from cim_to_linkml.parser import parse_uml_project
-from cim_to_linkml.read import read_uml_project
-from cim_to_linkml.writer import init_yaml_serializer, write_schema
+from cim_to_linkml.cache import get_default_cache_dir
+from cim_to_linkml.generator import GenerationContext, generate_schema, get_generation_date, get_import_closure
+from cim_to_linkml.incremental import (
+    fingerprint_schema,
+    is_up_to_date,
+    load_manifest,
+    record_fingerprint,
+    save_manifest,
+)
+from cim_to_linkml.lazy_model import LazyProject
+from cim_to_linkml.loader import load_uml_project
+from cim_to_linkml.metrics import Metrics, limit_memory, parse_memory_size
+from cim_to_linkml.read import Access
+from cim_to_linkml.selection import Selection, load_selection_file, resolve_selection
+from cim_to_linkml.uml_model import ObjectID, Project
+from cim_to_linkml.writer import (
+    FILE_EXTENSIONS,
+    IMPORTS_FILE_EXTENSION,
+    ArchiveSchemaWriter,
+    Format,
+    ThreadedSchemaWriter,
+    get_archive_name,
+    serialize_schema,
+    write_if_changed,
+)
 
 LOG_FORMAT = "[%(asctime)s] [%(levelname)s] %(message)s"
 
 logger = logging.getLogger(__name__)
-logging.basicConfig(format=LOG_FORMAT)
 
 
-init_yaml_serializer()
+def _parse_memory_size_option(ctx: click.Context, param: click.Parameter, value: Optional[str]) -> Optional[int]:
+    if value is None:
+        return None
+
+    try:
+        return parse_memory_size(value)
+    except ValueError as e:
+        raise click.BadParameter(str(e))
 
 
 @click.command()
@@ -27,9 +58,15 @@ init_yaml_serializer()
     "--package",
     "-p",
     type=str,
-    show_default=True,
-    default="TC57CIM",
-    help="Fully qualified package name.",
+    multiple=True,
+    show_default="TC57CIM",
+    help="Fully qualified package name. Can be passed several times to select several packages.",
+)
+@click.option(
+    "--selection-file",
+    type=click.Path(exists=True, dir_okay=False, path_type=Path),
+    help="YAML file listing packages to select, each of which can set its own `single_schema', "
+    "`ignore_subpackages' and `output_dir'. These default to the options passed.",
 )
 @click.option(
     "--single-schema",
@@ -45,6 +82,25 @@ init_yaml_serializer()
     show_default=True,
     help="If passed, all subpackages of the provided package are ignored, i.e. only the package itself is selected.",
 )
+@click.option(
+    "--imports",
+    "use_imports",
+    is_flag=True,
+    default=False,
+    show_default=True,
+    help="If passed, every class and enum is only defined in the schema of its own package, which the schemas "
+    "referring to it import. Schemas are also created for the packages outside the selection that it depends on. "
+    "The schemas are written as `.yaml' files, which is what LinkML looks for when importing. "
+    "Cannot be combined with `--single-schema'.",
+)
+@click.option(
+    "--format",
+    default="yaml",
+    show_default=True,
+    type=click.Choice(get_args(Format)),
+    help="Format of the schema files. JSON is much faster to load, and is written using orjson if installed. "
+    "JSON cannot be combined with `--imports', as LinkML only resolves imports of YAML schemas.",
+)
 @click.option(
     "--output-dir",
     "-o",
@@ -53,12 +109,136 @@ init_yaml_serializer()
     type=click.Path(path_type=Path),
     help="Directory where schemas will be outputted.",
 )
+@click.option(
+    "--output-archive",
+    type=click.Path(dir_okay=False, path_type=Path),
+    help="If passed, all schemas are written into this single archive instead, under their paths relative to the "
+    "output directory. Its kind follows from its extension: `.zip', `.tar', `.tar.gz' (or `.tgz'), `.tar.bz2' "
+    "or `.tar.xz'. Cannot be combined with `--incremental'.",
+)
+@click.option(
+    "--jobs",
+    "-j",
+    default=1,
+    show_default=True,
+    type=click.IntRange(min=0),
+    help="Number of processes generating schemas in parallel when creating a schema per package. 0 uses all CPUs.",
+)
+@click.option(
+    "--write-threads",
+    default=0,
+    show_default=True,
+    type=click.IntRange(min=0),
+    help="If positive, schemas are written by this many threads while the next ones are generated. "
+    "Only applies when creating a schema per package in a single process (`--jobs 1').",
+)
+@click.option(
+    "--max-in-flight",
+    default=4,
+    show_default=True,
+    type=click.IntRange(min=1),
+    help="Maximum number of schemas generated but not yet written when using `--write-threads', "
+    "which caps the memory they take.",
+)
+@click.option(
+    "--incremental",
+    is_flag=True,
+    default=False,
+    show_default=True,
+    help="If passed, only schemas whose packages or (referenced) classes were modified since the previous "
+    "incremental run are regenerated. This is tracked in a manifest in the output directory.",
+)
+@click.option(
+    "--reproducible",
+    is_flag=True,
+    default=False,
+    show_default=True,
+    help="If passed, the output depends on the QEA file only: the generation date of the schemas is taken "
+    "from $SOURCE_DATE_EPOCH if set, and omitted otherwise. Combined with unchanged schemas not being "
+    "rewritten, this leaves files that did not change untouched.",
+)
+@click.option(
+    "--cache-dir",
+    default=get_default_cache_dir(),
+    show_default="$XDG_CACHE_HOME/cim2linkml",
+    type=click.Path(file_okay=False, path_type=Path),
+    help="Directory where parsed QEA files are cached.",
+)
+@click.option(
+    "--no-cache",
+    is_flag=True,
+    default=False,
+    show_default=True,
+    help="If passed, the QEA file is always read and parsed, and the result is not cached.",
+)
+@click.option(
+    "--access",
+    default="default",
+    show_default=True,
+    type=click.Choice(get_args(Access)),
+    help="How the QEA file is opened. `immutable' opens it read-only and memory-mapped, without any locking, "
+    "which is much faster on network file systems, but requires that the file does not change during the run. "
+    "`memory' also copies it into memory, and indexes the copy, before reading it.",
+)
+@click.option(
+    "--lazy",
+    is_flag=True,
+    default=False,
+    show_default=True,
+    help="If passed, classes and relations are read from the QEA file as they are needed, rather than all up front. "
+    "This takes far less memory for very large models, but more time. The project is not cached.",
+)
+@click.option(
+    "--profile",
+    type=click.Path(dir_okay=False, path_type=Path),
+    help="If passed, the run is profiled using cProfile and the statistics are written to this (pstats) file. "
+    "A summary of the time and memory per stage is printed as well. Worker processes are not profiled.",
+)
+@click.option(
+    "--trace-memory",
+    is_flag=True,
+    default=False,
+    show_default=True,
+    help="If passed, memory allocations are traced using tracemalloc. The memory allocated per stage, and the lines "
+    "that allocated the most, are added to the metrics and printed in a summary. This slows the run down "
+    "considerably. Worker processes are not traced.",
+)
+@click.option(
+    "--max-memory",
+    callback=_parse_memory_size_option,
+    metavar="SIZE",
+    help="If passed, the run fails as soon as it needs more than this much memory (e.g. `4G' or `512M'), naming "
+    "the stage it was in, rather than it getting killed. Applies to every process on its own.",
+)
+@click.option(
+    "--metrics-file",
+    type=click.Path(dir_okay=False, path_type=Path),
+    help="If passed, the time and memory per stage, the generation time per package and the cache statistics "
+    "are written to this file as JSON.",
+)
 def cli(
     cim_db,
     package,
+    selection_file,
     single_schema,
     ignore_subpackages,
+    use_imports,
+    format,
     output_dir,
+    output_archive,
+    jobs,
+    write_threads,
+    max_in_flight,
+    incremental,
+    reproducible,
+    cache_dir,
+    no_cache,
+    access,
+    lazy,
+    profile,
+    trace_memory,
+    max_memory,
+    metrics_file,
 ):
     """
     Generates LinkML schemas from the supplied Sparx EA QEA database file.
@@ -77,28 +257,210 @@ def cli(
     Finally, it's possible to ignore all subpackages and create a single schema file
     just for the specified package alone. To achieve this, pass `--ignore-subpackages'.
 
+    Several packages can be selected at once by passing `--package' several times,
+    or by listing them in a `--selection-file'. The QEA file is then read only once
+    for all of them.
+
     """
 
-    with sqlite3.connect(cim_db) as conn:
-        uml_project = parse_uml_project(*read_uml_project(conn))
+    logging.basicConfig(format=LOG_FORMAT)
+
+    defaults = Selection("TC57CIM", single_schema, ignore_subpackages, output_dir)
+    selections = [defaults._replace(package=p) for p in package]
+    if selection_file:
+        try:
+            selections.extend(load_selection_file(selection_file, defaults))
+        except ValueError as e:
+            raise click.BadParameter(str(e), param_hint="'--selection-file'")
+    if not selections:
+        selections = [defaults]
 
+    if use_imports and any(selection.single_schema for selection in selections):
+        raise click.UsageError("`--imports' cannot be combined with `--single-schema'.")
+    if use_imports and format == "json":
+        raise click.UsageError("`--imports' cannot be combined with `--format json'.")
+    if output_archive and incremental:
+        raise click.UsageError("`--output-archive' cannot be combined with `--incremental'.")
+    if output_archive:
+        # The archive holds the output directory, so the schemas of every selection should be written inside it.
+        for selection in selections:
+            try:
+                get_archive_name(selection.output_dir, output_dir)
+            except ValueError:
+                raise click.BadParameter(
+                    f"The output directory of `{selection.package}', `{selection.output_dir}', lies outside "
+                    f"`{output_dir}', which the archive holds.",
+                    param_hint="'--selection-file'",
+                )
     try:
-        uml_package = uml_project.packages.by_qualified_name[package]
-    except KeyError:
-        click.echo(f"Ignoring unknown package: `{package}'.", err=True)
-        raise SystemExit(1)
+        get_generation_date(reproducible)
+    except ValueError as e:
+        raise click.UsageError(str(e))
+
+    metrics = Metrics()
+    profiler = cProfile.Profile() if profile else None
+
+    if max_memory is not None:
+        try:
+            limit_memory(max_memory)
+        except NotImplementedError as e:
+            raise click.BadParameter(str(e), param_hint="'--max-memory'")
+    if trace_memory:
+        tracemalloc.start()
+    if profiler:
+        profiler.enable()
+    try:
+        _generate_schemas(
+            cim_db,
+            selections,
+            use_imports,
+            format,
+            output_archive,
+            output_dir,
+            jobs,
+            write_threads,
+            max_in_flight,
+            incremental,
+            reproducible,
+            cache_dir,
+            no_cache,
+            access,
+            lazy,
+            metrics,
+        )
+    except MemoryError:
+        stage = f" in the `{metrics.failed_stage}' stage" if metrics.failed_stage else ""
+        if max_memory is not None:
+            raise click.ClickException(
+                f"Needed more memory than the {max_memory / 2**20:.0f} MiB allowed by `--max-memory'{stage}."
+            )
+        raise click.ClickException(f"Ran out of memory{stage}.")
+    finally:
+        if profiler:
+            profiler.disable()
+            profiler.dump_stats(profile)
+        if trace_memory:
+            tracemalloc.stop()
+        if profiler or trace_memory:
+            click.echo(metrics.format_summary(), err=True)
+        if metrics_file:
+            metrics.write(metrics_file)
+
+
+def _generate_schemas(
+    cim_db,
+    selections: list[Selection],
+    use_imports,
+    format: Format,
+    output_archive: Optional[Path],
+    output_dir: Path,
+    jobs,
+    write_threads,
+    max_in_flight,
+    incremental,
+    reproducible,
+    cache_dir,
+    no_cache,
+    access,
+    lazy,
+    metrics: Metrics,
+):
+    if lazy:
+        with metrics.stage("index"):
+            uml_project = LazyProject(cim_db, access=access)
+    else:
+        # The schemas of the packages imported hold all their classes, not just the ones the selection needs.
+        uml_project = load_uml_project(
+            cim_db, None if use_imports else selections, cache_dir, no_cache, metrics, access
+        )
 
-    if uml_project.packages.is_leaf_package(package):
-        single_schema = True
-        ignore_subpackages = True
+    ctx = GenerationContext(uml_project, reproducible)
 
-    if ignore_subpackages:
-        uml_packages = [uml_package]
-        single_schema = True
+    # Workers are only started once schemas are submitted to the pool, and then serve all selections.
+    # They share the generation date of the run.
+    jobs = jobs or os.cpu_count() or 1
+    pool = (
+        ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker, initargs=(uml_project, ctx.generation_date))
+        if jobs != 1
+        else None
+    )
+
+    if output_archive:
+        # Written in the main process, which workers hand their schemas back to.
+        try:
+            writer = ArchiveSchemaWriter(output_archive, output_dir, metrics, ctx.generation_date)
+        except ValueError as e:
+            raise click.BadParameter(str(e), param_hint="'--output-archive'")
+    elif write_threads and pool is None:
+        writer = ThreadedSchemaWriter(write_threads, max_in_flight, metrics)
     else:
-        uml_packages = [p for qname, p in uml_project.packages.by_qualified_name.items() if qname.startswith(package)]
+        writer = None
+
+    unknown_packages = False
+    with (
+        uml_project if isinstance(uml_project, LazyProject) else nullcontext(),
+        ctx,
+        pool or nullcontext(),
+        writer or nullcontext(),
+    ):
+        for selection in selections:
+            try:
+                single_schema, uml_packages = resolve_selection(selection, uml_project, use_imports)
+            except KeyError:
+                click.echo(f"Ignoring unknown package: `{selection.package}'.", err=True)
+                unknown_packages = True
+                continue
+
+            _generate_selection(
+                selection,
+                single_schema,
+                uml_packages,
+                ctx,
+                use_imports,
+                format,
+                incremental,
+                pool,
+                jobs,
+                writer,
+                metrics,
+            )
 
-    os.makedirs(output_dir, exist_ok=True)
+        for name, stats in ctx.stats().items():
+            logger.debug(f"Generation cache `{name}': {stats.hits} hits, {stats.misses} misses, {stats.size} entries.")
+            metrics.caches[name] = stats._asdict()
+
+    click.echo(
+        f"Wrote {metrics.files['written']} schema(s), skipped {metrics.files['skipped']} unchanged schema(s).",
+        err=True,
+    )
+
+    if unknown_packages:
+        raise SystemExit(1)
+
+
+def _generate_selection(
+    selection: Selection,
+    single_schema: bool,
+    uml_packages,
+    ctx: GenerationContext,
+    use_imports,
+    format: Format,
+    incremental,
+    pool: Optional[ProcessPoolExecutor],
+    jobs: int,
+    writer: Optional[ThreadedSchemaWriter | ArchiveSchemaWriter],
+    metrics: Metrics,
+) -> None:
+    uml_project = ctx.uml_project
+    package = selection.package
+    output_dir = selection.output_dir
+    uml_package = uml_project.packages.by_qualified_name[package]
+
+    # Writers create the directories they write to themselves, if any.
+    if writer is None or incremental:
+        os.makedirs(output_dir, exist_ok=True)
+
+    manifest = load_manifest(output_dir) if incremental else None
 
     if single_schema:
         uml_classes = list(
@@ -106,25 +468,192 @@ def cli(
                 uml_class for p in uml_packages if (uml_class := uml_project.classes.by_package.get(p.id))
             )
         )
-        schema = generate_schema(uml_package, uml_classes, uml_project)
+        schema_path = os.path.join(output_dir, package) + FILE_EXTENSIONS[format]
+
+        fingerprint = ""
+        up_to_date = False
+        if manifest is not None:
+            fingerprint = fingerprint_schema(uml_package, uml_classes, ctx)
+            up_to_date = is_up_to_date(manifest, output_dir, schema_path, fingerprint)
 
-        schema_path = os.path.join(output_dir, package) + ".yml"
-        write_schema(schema, schema_path)
+        if up_to_date:
+            logger.info(f"Schema `{schema_path}' is up to date.")
+            metrics.files["skipped"] += 1
+        else:
+            with metrics.stage("generate", package):
+                schema = generate_schema(uml_package, uml_classes, uml_project, ctx)
+            with metrics.stage("serialize", package):
+                content = serialize_schema(schema, format)
+            if writer is not None:
+                writer.submit(content, schema_path, package)
+                writer.join()
+            else:
+                with metrics.stage("write", package):
+                    written = write_if_changed(content, schema_path)
+                metrics.files["written" if written else "skipped"] += 1
+
+            if manifest is not None:
+                record_fingerprint(manifest, output_dir, schema_path, fingerprint)
     else:
-        for uml_package in uml_packages:
-            uml_classes = uml_project.classes.by_package.get(uml_package.id, [])
-            schema = generate_schema(uml_package, uml_classes, uml_project)
+        if use_imports:
+            uml_packages = get_import_closure(uml_packages, ctx)
+
+        fingerprints = {}
+        if manifest is not None:
+            stale_packages = []
+            for uml_package in uml_packages:
+                uml_classes = uml_project.classes.by_package.get(uml_package.id, [])
+                out_file = _get_package_schema_path(uml_package, output_dir, uml_project, format, use_imports)
+                fingerprint = fingerprint_schema(uml_package, uml_classes, ctx, use_imports)
+                if not is_up_to_date(manifest, output_dir, out_file, fingerprint):
+                    stale_packages.append(uml_package)
+                    fingerprints[out_file] = fingerprint
+
+            logger.info(f"Regenerating {len(stale_packages)} of {len(uml_packages)} schemas.")
+            metrics.files["skipped"] += len(uml_packages) - len(stale_packages)
+            uml_packages = stale_packages
+
+        if pool is not None:
+            _generate_package_schemas_in_parallel(
+                pool, jobs, uml_packages, output_dir, use_imports, format, metrics, writer
+            )
+        else:
+            for uml_package in uml_packages:
+                _generate_package_schema(uml_package, output_dir, ctx, use_imports, format, metrics, writer)
+            if writer is not None:
+                writer.join()
+
+        if manifest is not None:
+            for out_file, fingerprint in fingerprints.items():
+                record_fingerprint(manifest, output_dir, out_file, fingerprint)
+
+    if manifest is not None:
+        save_manifest(manifest, output_dir)
+
+
+def _get_package_schema_path(
+    uml_package, output_dir, uml_project, format: Format = "yaml", use_imports: bool = False
+) -> str:
+    qname = uml_project.packages.get_qualified_name(uml_package.id)
+    package_path = qname.split(".")
+    dir_path = os.path.join(output_dir, os.path.sep.join(package_path[:-1]))
+    file_name = package_path[-1] + (IMPORTS_FILE_EXTENSION if use_imports else FILE_EXTENSIONS[format])
+
+    return os.path.join(dir_path, file_name)
+
+
+def _generate_package_schema(
+    uml_package,
+    output_dir,
+    ctx: GenerationContext,
+    use_imports: bool,
+    format: Format,
+    metrics: Metrics,
+    writer: Optional[ThreadedSchemaWriter | ArchiveSchemaWriter] = None,
+) -> str:
+    qname, out_file, content = _serialize_package_schema(uml_package, output_dir, ctx, use_imports, format, metrics)
+
+    if writer is not None:
+        writer.submit(content, out_file, qname)
+    else:
+        with metrics.stage("write", qname):
+            os.makedirs(os.path.dirname(out_file), exist_ok=True)
+            written = write_if_changed(content, out_file)
+        metrics.files["written" if written else "skipped"] += 1
+
+    return out_file
+
+
+def _serialize_package_schema(
+    uml_package,
+    output_dir,
+    ctx: GenerationContext,
+    use_imports: bool,
+    format: Format,
+    metrics: Metrics,
+) -> tuple[str, str, bytes]:
+    """Generates and serializes the schema of a package, returning its qualified name, path and content."""
+
+    uml_project = ctx.uml_project
+    uml_classes = uml_project.classes.by_package.get(uml_package.id, [])
+    qname = uml_project.packages.get_qualified_name(uml_package.id)
+
+    with metrics.stage("generate", qname):
+        schema = generate_schema(uml_package, uml_classes, uml_project, ctx, use_imports)
+
+    out_file = _get_package_schema_path(uml_package, output_dir, uml_project, format, use_imports)
+    with metrics.stage("serialize", qname):
+        content = serialize_schema(schema, format)
+
+    return qname, out_file, content
+
+
+# State of a worker process, set once by `_init_worker` so tasks only carry package IDs and options.
+_worker_ctx: GenerationContext | None = None
+
+
+def _init_worker(uml_project: Project, generation_date: Optional[datetime]) -> None:
+    global _worker_ctx
+
+    _worker_ctx = GenerationContext(uml_project)
+    _worker_ctx.generation_date = generation_date
+
+
+def _generate_package_schema_in_worker(
+    package_id: ObjectID, output_dir: os.PathLike, use_imports: bool, format: Format, hand_back: bool
+) -> tuple[str, str, Optional[bytes], Metrics]:
+    """Generates and writes the schema of a package, or returns its content instead if `hand_back` is set."""
+
+    ctx = _worker_ctx
+    assert ctx is not None, "Worker is not initialized."
+
+    uml_package = ctx.uml_project.packages.by_id[package_id]
+    metrics = Metrics()
+    if hand_back:
+        qname, out_file, content = _serialize_package_schema(uml_package, output_dir, ctx, use_imports, format, metrics)
+    else:
+        qname = ctx.uml_project.packages.get_qualified_name(package_id)
+        out_file = _generate_package_schema(uml_package, output_dir, ctx, use_imports, format, metrics)
+        content = None
+
+    return qname, out_file, content, metrics
+
+
+def _generate_package_schemas_in_parallel(
+    pool: ProcessPoolExecutor,
+    jobs: int,
+    uml_packages,
+    output_dir,
+    use_imports: bool,
+    format: Format,
+    metrics: Metrics,
+    writer: Optional[ThreadedSchemaWriter | ArchiveSchemaWriter] = None,
+) -> None:
+    """Spreads per-package generation and writing over a pool of `jobs` processes.
+
+    The project is sent to every worker once, when it starts. Each worker keeps its
+    own generation context for all the packages it is handed. If a writer is given,
+    the workers hand the serialized schemas back to be written by it instead.
+    """
 
-            qname = uml_project.packages.get_qualified_name(uml_package.id)
-            package_path = qname.split(".")
-            dir_path = os.path.join(output_dir, os.path.sep.join(package_path[:-1]))
-            file_name = package_path[-1] + ".yml"
-            out_file = os.path.join(dir_path, file_name)
+    package_ids = [p.id for p in uml_packages]
+    chunk_size = max(1, len(package_ids) // (jobs * 4))
 
-            os.makedirs(dir_path, exist_ok=True)
-            write_schema(schema, out_file)
+    for qname, out_file, content, worker_metrics in pool.map(
+        _generate_package_schema_in_worker,
+        package_ids,
+        repeat(output_dir),
+        repeat(use_imports),
+        repeat(format),
+        repeat(writer is not None),
+        chunksize=chunk_size,
+    ):
+        metrics.merge(worker_metrics)
+        if writer is not None:
+            assert content is not None
+            writer.submit(content, out_file, qname)
+        logger.debug(f"Wrote `{out_file}'.")
 
 
 if __name__ == "__main__":
-    # cProfile.run("main()", sort="tottime")
     cli.main()
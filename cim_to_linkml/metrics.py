@@ -0,0 +1,227 @@
+import json
+import os
+import re
+import sys
+import time
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+from operator import attrgetter
+from typing import Iterator, Optional
+
+try:
+    import resource
+except ImportError:  # Not available on Windows.
+    resource = None
+
+
+def get_peak_rss() -> Optional[int]:
+    """Returns the peak resident set size of this process so far, in bytes."""
+
+    if resource is None:
+        return None
+
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes.
+    return peak_rss if sys.platform == "darwin" else peak_rss * 1024
+
+
+def limit_memory(max_bytes: int) -> None:
+    """Has allocations beyond `max_bytes` of data memory raise a `MemoryError`, rather than get the process killed.
+
+    The limit is on the heap and other private writable memory, which also covers any
+    worker processes, each on its own.
+    """
+
+    if resource is None or not hasattr(resource, "RLIMIT_DATA"):
+        raise NotImplementedError("Limiting memory is not supported on this platform.")
+
+    _, hard_limit = resource.getrlimit(resource.RLIMIT_DATA)
+    if hard_limit != resource.RLIM_INFINITY:
+        max_bytes = min(max_bytes, hard_limit)
+    resource.setrlimit(resource.RLIMIT_DATA, (max_bytes, hard_limit))
+
+
+_MEMORY_SIZE_UNITS = {"": 1, "K": 2**10, "M": 2**20, "G": 2**30, "T": 2**40}
+
+
+def parse_memory_size(val: str) -> int:
+    """Parses a number of bytes, optionally followed by a (binary) unit, e.g. `512M` or `2G`."""
+
+    match = re.fullmatch(r"\s*(\d+(?:\.\d+)?)\s*(?:([KMGT])i?)?B?\s*", val, re.IGNORECASE)
+    if match is None:
+        raise ValueError(f"Invalid memory size: `{val}'.")
+
+    number, unit = match.groups()
+    return int(float(number) * _MEMORY_SIZE_UNITS[(unit or "").upper()])
+
+
+# The number of allocation sites listed per stage when tracing memory.
+TOP_ALLOCATIONS = 10
+
+
+def get_top_allocations(
+    snapshot: tracemalloc.Snapshot, previous_snapshot: tracemalloc.Snapshot, limit: int = TOP_ALLOCATIONS
+) -> list[dict]:
+    """Returns the lines that allocated the most memory between two snapshots, and that still hold it."""
+
+    filters = [tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, __file__)]
+    diffs = snapshot.filter_traces(filters).compare_to(previous_snapshot.filter_traces(filters), "lineno")
+
+    return [
+        {
+            "file": diff.traceback[0].filename,
+            "line": diff.traceback[0].lineno,
+            "size": diff.size_diff,
+            "count": diff.count_diff,
+        }
+        for diff in sorted(diffs, key=attrgetter("size_diff"), reverse=True)[:limit]
+        if diff.size_diff > 0
+    ]
+
+
+class Metrics:
+    """Collects the wall time and memory use of the stages of a run.
+
+    Stages can be entered several times, e.g. `generate` once per package, in which
+    case their times are summed, in total as well as per package. The peak memory of
+    a stage is the high-water mark of the process at the end of it, so the stage
+    during which it jumps is the one that grew the process.
+
+    While `tracemalloc` is tracing, the memory allocated by each stage (and still held
+    at its end) is collected as well, along with the highest traced memory during it.
+    The lines that allocated the most are listed for the first call of each stage
+    only, since comparing snapshots of all traced memory is slow.
+
+    It also counts the schema files that were written, and those that were skipped
+    because they were unchanged or up to date.
+    """
+
+    def __init__(self) -> None:
+        self.stages: dict[str, dict] = {}
+        self.packages: dict[str, dict[str, float]] = {}
+        self.caches: dict[str, dict] = {}
+        self.files: Counter[str] = Counter(written=0, skipped=0)
+        self.allocations: dict[str, list[dict]] = {}
+        # The (innermost) stage an exception was raised in, if any.
+        self.failed_stage: Optional[str] = None
+
+    @contextmanager
+    def stage(self, name: str, package: Optional[str] = None) -> Iterator[None]:
+        snapshot: Optional[tracemalloc.Snapshot] = None
+        traced_before: Optional[int] = None
+        if tracemalloc.is_tracing():
+            snapshot = tracemalloc.take_snapshot() if name not in self.allocations else None
+            traced_before, _ = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+
+        start = time.perf_counter()
+        try:
+            yield
+        except BaseException:
+            self.failed_stage = self.failed_stage or name
+            raise
+        finally:
+            wall_time = time.perf_counter() - start
+
+            traced = None
+            if traced_before is not None:
+                traced_after, traced_peak = tracemalloc.get_traced_memory()
+                traced = (traced_after - traced_before, traced_peak)
+                if snapshot is not None:
+                    self.allocations[name] = get_top_allocations(tracemalloc.take_snapshot(), snapshot)
+
+            self.record(name, wall_time, package=package, traced=traced)
+
+    def record(
+        self,
+        name: str,
+        wall_time: float,
+        peak_rss: Optional[int] = None,
+        package: Optional[str] = None,
+        traced: Optional[tuple[int, int]] = None,
+    ):
+        stage = self.stages.setdefault(name, {"wall_time": 0.0, "count": 0, "peak_rss": None})
+        stage["wall_time"] += wall_time
+        stage["count"] += 1
+
+        if traced is not None:
+            traced_growth, traced_peak = traced
+            stage["traced_growth"] = stage.get("traced_growth", 0) + traced_growth
+            stage["traced_peak"] = max(stage.get("traced_peak", 0), traced_peak)
+
+        if peak_rss is None:
+            peak_rss = get_peak_rss()
+        if peak_rss is not None:
+            stage["peak_rss"] = max(stage["peak_rss"] or 0, peak_rss)
+
+        if package is not None:
+            timings = self.packages.setdefault(package, {})
+            timings[name] = timings.get(name, 0.0) + wall_time
+
+    def merge(self, other: "Metrics") -> None:
+        """Adds the metrics collected elsewhere, e.g. in a worker process."""
+
+        for name, stage in other.stages.items():
+            mine = self.stages.setdefault(name, {"wall_time": 0.0, "count": 0, "peak_rss": None})
+            mine["wall_time"] += stage["wall_time"]
+            mine["count"] += stage["count"]
+            if stage["peak_rss"] is not None:
+                mine["peak_rss"] = max(mine["peak_rss"] or 0, stage["peak_rss"])
+            if "traced_peak" in stage:
+                mine["traced_growth"] = mine.get("traced_growth", 0) + stage["traced_growth"]
+                mine["traced_peak"] = max(mine.get("traced_peak", 0), stage["traced_peak"])
+
+        for package, timings in other.packages.items():
+            mine = self.packages.setdefault(package, {})
+            for name, wall_time in timings.items():
+                mine[name] = mine.get(name, 0.0) + wall_time
+
+        self.files.update(other.files)
+        for name, allocations in other.allocations.items():
+            self.allocations.setdefault(name, allocations)
+
+    def to_dict(self) -> dict:
+        return {
+            "stages": self.stages,
+            "packages": self.packages,
+            "caches": self.caches,
+            "files": dict(self.files),
+            "allocations": self.allocations,
+        }
+
+    def write(self, out_file: os.PathLike | str) -> None:
+        with open(out_file, "w") as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+    def format_summary(self) -> str:
+        traced = any("traced_peak" in stage for stage in self.stages.values())
+
+        header = f"{'stage':<12} {'calls':>6} {'wall time':>11} {'peak RSS':>11}"
+        if traced:
+            header += f" {'allocated':>11} {'peak traced':>11}"
+        lines = [header]
+        for name, stage in self.stages.items():
+            line = f"{name:<12} {stage['count']:>6} {stage['wall_time']:>10.3f}s {_format_size(stage['peak_rss'])}"
+            if traced:
+                line += f" {_format_size(stage.get('traced_growth'))} {_format_size(stage.get('traced_peak'))}"
+            lines.append(line)
+
+        for name, allocations in self.allocations.items():
+            lines.append(f"top allocations in `{name}':")
+            for allocation in allocations:
+                lines.append(
+                    f"  {allocation['size'] / 2**10:>10.1f} KiB {allocation['count']:>9} blocks  "
+                    f"{allocation['file']}:{allocation['line']}"
+                )
+
+        for name, stats in self.caches.items():
+            lines.append(f"cache `{name}': " + ", ".join(f"{k}={v}" for k, v in stats.items()))
+
+        lines.append(f"files: {self.files['written']} written, {self.files['skipped']} skipped")
+
+        return "\n".join(lines)
+
+
+def _format_size(size: Optional[int]) -> str:
+    return f"{size / 2**20:>8.1f} MiB" if size is not None else f"{'-':>11}"
@@ -1,10 +1,28 @@
-import sqlite3
-from datetime import datetime
-from itertools import groupby
+import sys
+from itertools import chain, groupby
 from operator import itemgetter
+from typing import Iterable, Optional, overload
 
 import cim_to_linkml.uml_model as uml_model
 
+# Names, types and authors repeat throughout the model, while SQLite hands out a new
+# string for every row. Interning them, and sharing equal cardinalities within a parse,
+# keeps a single copy of each in memory. Dates are left unparsed, see `uml_model.parse_date`.
+
+Cardinalities = dict[Optional[str], uml_model.Cardinality]
+
+
+@overload
+def _intern(val: str) -> str: ...
+
+
+@overload
+def _intern(val: None) -> None: ...
+
+
+def _intern(val: str | None) -> str | None:
+    return None if val is None else sys.intern(val)
+
 
 def parse_cardinality(val: str | None) -> uml_model.Cardinality:
     if val is None:
@@ -18,6 +36,14 @@ def parse_cardinality(val: str | None) -> uml_model.Cardinality:
     )
 
 
+def _get_cardinality(val: str | None, cardinalities: Cardinalities) -> uml_model.Cardinality:
+    try:
+        return cardinalities[val]
+    except KeyError:
+        cardinality = cardinalities[val] = parse_cardinality(val)
+        return cardinality
+
+
 def parse_cardinality_val(val: str | None) -> uml_model.CardinalityValue:
     match val:
         case "" | None:
@@ -28,105 +54,153 @@ def parse_cardinality_val(val: str | None) -> uml_model.CardinalityValue:
             return int(val)
 
 
-def parse_iso_datetime_val(val: str | None) -> datetime:
-    if val is None:
-        return datetime.now()
-
-    return datetime.fromisoformat(val)
-
-
 def parse_uml_project(
-    uml_package_results: sqlite3.Cursor,
-    uml_class_results: sqlite3.Cursor,
-    uml_relation_results: sqlite3.Cursor,
+    uml_package_results: Iterable[tuple],
+    uml_class_results: Iterable[tuple],
+    uml_relation_results: Iterable[tuple],
 ) -> uml_model.Project:
-    uml_packages = uml_model.Packages({parse_uml_package(pkg_row) for pkg_row in uml_package_results})
+    """Parses the package, class and relation rows, e.g. the cursors of `read.read_uml_project`."""
+
+    # Rows are unique per ID, so lists suffice; sets would hash every (nested) field of every element.
+    uml_packages = uml_model.Packages([parse_uml_package(pkg_row) for pkg_row in uml_package_results])
     uml_classes = uml_model.Classes(
-        {parse_uml_class(list(class_rows)) for _, class_rows in groupby(uml_class_results, itemgetter("class_id"))}
+        [parse_uml_class(class_rows) for _, class_rows in groupby(uml_class_results, _get_class_id)]
+    )
+    cardinalities: Cardinalities = {}
+    uml_relations = uml_model.Relations(
+        [parse_uml_relation(rel_row, cardinalities) for rel_row in uml_relation_results]
     )
-    uml_relations = uml_model.Relations({parse_uml_relation(rel_row) for rel_row in uml_relation_results})
 
     uml_project = uml_model.Project(classes=uml_classes, packages=uml_packages, relations=uml_relations)
 
     return uml_project
 
 
-def parse_uml_package(package_row: sqlite3.Cursor) -> uml_model.Package:
-    uml_package = dict(package_row)
+def parse_uml_package(package_row: tuple) -> uml_model.Package:
+    id_, name, parent_id, created_date, modified_date, author, note = package_row
 
     return uml_model.Package(
-        id=uml_package["id"],
-        name=uml_package["name"],
-        author=uml_package["author"],
-        parent=uml_package["parent_id"],
-        created_date=parse_iso_datetime_val(uml_package["created_date"]),
-        modified_date=parse_iso_datetime_val(uml_package["modified_date"]),
-        notes=uml_package["note"],
+        id=id_,
+        name=_intern(name),
+        author=_intern(author),
+        parent=parent_id,
+        created=_intern(created_date),
+        modified=_intern(modified_date),
+        notes=note,
     )
 
 
-def parse_uml_relation(relation_row: sqlite3.Cursor) -> uml_model.Relation:
-    uml_relation = dict(relation_row)
+def parse_uml_relation(relation_row: tuple, cardinalities: Optional[Cardinalities] = None) -> uml_model.Relation:
+    """Parses a relation, sharing equal cardinalities with the relations parsed with the same `cardinalities`."""
+
+    (
+        id_,
+        type_,
+        start_object_id,
+        end_object_id,
+        direction,
+        _sub_type,
+        source_card,
+        source_role,
+        source_role_note,
+        dest_card,
+        dest_role,
+        dest_role_note,
+    ) = relation_row
+
+    if cardinalities is None:
+        cardinalities = {}
 
     try:
-        direction = uml_model.RelationDirection(uml_relation["direction"])
+        direction = uml_model.RelationDirection(direction)
     except ValueError:
         direction = None
 
     return uml_model.Relation(
-        id=uml_relation["id"],
-        type=uml_model.RelationType(uml_relation["type"]),
-        source_class=uml_relation["start_object_id"],
-        dest_class=uml_relation["end_object_id"],
+        id=id_,
+        type=uml_model.RelationType(type_),
+        source_class=start_object_id,
+        dest_class=end_object_id,
         direction=direction,
-        source_card=parse_cardinality(uml_relation["source_card"]),
-        source_role=uml_relation["source_role"],
-        source_role_note=uml_relation["source_role_note"],
-        dest_card=parse_cardinality(uml_relation["dest_card"]),
-        dest_role=uml_relation["dest_role"],
-        dest_role_note=uml_relation["dest_role_note"],
+        source_card=_get_cardinality(source_card, cardinalities),
+        source_role=_intern(source_role),
+        source_role_note=source_role_note,
+        dest_card=_get_cardinality(dest_card, cardinalities),
+        dest_role=_intern(dest_role),
+        dest_role_note=dest_role_note,
     )
 
 
-def _parse_uml_class_attr(attr: dict) -> uml_model.Attribute:
+# Class rows consist of the class columns followed by the (joined) attribute columns.
+_CLASS_COLUMNS = slice(0, 8)
+_ATTR_COLUMNS = slice(8, 16)
+_get_class_id = itemgetter(0)
+_get_attr_id = itemgetter(8)
+_get_attr_name = itemgetter(9)
+
+
+def _parse_uml_class_attr(class_id: uml_model.ObjectID, attr_row: tuple) -> uml_model.Attribute:
+    (
+        attr_id,
+        attr_name,
+        attr_lower_bound,
+        attr_upper_bound,
+        attr_type,
+        attr_notes,
+        attr_stereotype,
+        attr_default,
+    ) = attr_row[_ATTR_COLUMNS]
+
     try:
-        stereotype = uml_model.AttributeStereotype(attr["attr_stereotype"])
+        stereotype = uml_model.AttributeStereotype(attr_stereotype)
     except ValueError:
         stereotype = None
 
     return uml_model.Attribute(
-        id=attr["attr_id"],
-        class_=attr["class_id"],
-        name=attr["attr_name"],
-        lower_bound=parse_cardinality_val(attr["attr_lower_bound"]),
-        upper_bound=parse_cardinality_val(attr["attr_upper_bound"]),
-        type=attr["attr_type"],
-        default=attr["attr_default"],
-        notes=attr["attr_notes"],
+        id=attr_id,
+        class_=class_id,
+        name=_intern(attr_name),
+        lower_bound=parse_cardinality_val(attr_lower_bound),
+        upper_bound=parse_cardinality_val(attr_upper_bound),
+        type=_intern(attr_type),
+        default=_intern(attr_default),
+        notes=attr_notes,
         stereotype=stereotype,
     )
 
 
-def parse_uml_class(class_rows: list[sqlite3.Cursor]) -> uml_model.Class:
-    class_rows_ = [dict(row) for row in class_rows]
+def parse_uml_class(class_rows: Iterable[tuple]) -> uml_model.Class:
+    class_rows = iter(class_rows)
+    first_row = next(class_rows)
+    (
+        class_id,
+        class_name,
+        class_author,
+        class_package_id,
+        class_created_date,
+        class_modified_date,
+        class_stereotype,
+        class_note,
+    ) = first_row[_CLASS_COLUMNS]
+
     try:
-        stereotype = uml_model.ClassStereotype(class_rows_[0]["class_stereotype"])
+        stereotype = uml_model.ClassStereotype(class_stereotype)
     except ValueError:
         stereotype = None
 
     return uml_model.Class(
-        id=class_rows_[0]["class_id"],
-        name=class_rows_[0]["class_name"],
-        author=class_rows_[0]["class_author"],
-        package=class_rows_[0]["class_package_id"],
+        id=class_id,
+        name=_intern(class_name),
+        author=_intern(class_author),
+        package=class_package_id,
         attributes=tuple(
-            _parse_uml_class_attr(attr)
-            for _, attr_ in groupby(class_rows_, itemgetter("attr_name"))
-            if (attr := next(attr_))
-            if attr["attr_id"] is not None
+            _parse_uml_class_attr(class_id, attr_row)
+            for _, attr_rows in groupby(chain((first_row,), class_rows), _get_attr_name)
+            if (attr_row := next(attr_rows))
+            if _get_attr_id(attr_row) is not None
         ),
-        created_date=parse_iso_datetime_val(class_rows_[0]["class_created_date"]),
-        modified_date=parse_iso_datetime_val(class_rows_[0]["class_modified_date"]),
-        note=class_rows_[0]["class_note"],
+        created=_intern(class_created_date),
+        modified=_intern(class_modified_date),
+        note=class_note,
         stereotype=stereotype,
     )
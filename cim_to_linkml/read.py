@@ -1,51 +1,281 @@
+import json
+import os
 import sqlite3
 import textwrap
+from contextlib import closing
+from pathlib import Path
+from typing import Iterable, Literal, Optional
+
+# How to open QEA files, see `connect`.
+Access = Literal["default", "immutable", "memory"]
+
+MMAP_SIZE = 1 << 30
+
+# The queries below yield plain tuples, not `sqlite3.Row`s, so the parser reads the
+# columns by position. Keep the column order in sync with `parser.py`.
+
+_UML_RELATION_COLUMNS = """
+    Connector_ID AS id,
+    Connector_Type AS type,
+    Start_Object_ID AS start_object_id,
+    End_Object_ID AS end_object_id,
+    Direction AS direction,
+    SubType AS sub_type,
+    SourceCard AS source_card,
+    SourceRole AS source_role,
+    SourceRoleNote AS source_role_note,
+    DestCard AS dest_card,
+    DestRole AS dest_role,
+    DestRoleNote AS dest_role_note
+"""
+
+_UML_CLASS_COLUMNS = """
+    Class.Object_ID AS class_id,
+    Class.Name AS class_name,
+    Class.Author AS class_author,
+    Class.Package_ID AS class_package_id,
+    Class.CreatedDate AS class_created_date,
+    Class.ModifiedDate AS class_modified_date,
+    Class.Stereotype AS class_stereotype,
+    Class.Note AS class_note,
+    Attribute.ID AS attr_id,
+    Attribute.Name AS attr_name,
+    Attribute.LowerBound AS attr_lower_bound,
+    Attribute.UpperBound AS attr_upper_bound,
+    Attribute.Type AS attr_type,
+    Attribute.Notes AS attr_notes,
+    Attribute.Stereotype AS attr_stereotype,
+    Attribute."Default" AS attr_default
+"""
+
+
+def connect(
+    qea_file: os.PathLike | str, access: Access = "default", check_same_thread: bool = True
+) -> sqlite3.Connection:
+    """Opens the QEA file.
+
+    By default, it is opened like any SQLite database. `immutable` opens it read-only
+    and memory-mapped, and has SQLite skip all locking and change detection, which is
+    much faster on network file systems, but only correct if the file does not change
+    while it is open. `memory` copies the file into memory that way before anything
+    is queried, and indexes the copy for the queries below.
+    """
+
+    if access == "default":
+        return sqlite3.connect(qea_file, check_same_thread=check_same_thread)
+
+    uri = f"{Path(qea_file).resolve().as_uri()}?mode=ro&immutable=1"
+    conn = sqlite3.connect(uri, uri=True, check_same_thread=check_same_thread)
+    conn.execute(f"PRAGMA mmap_size = {MMAP_SIZE}")
+
+    if access == "memory":
+        with closing(conn):
+            memory_conn = sqlite3.connect(":memory:", check_same_thread=check_same_thread)
+            conn.backup(memory_conn)
+        conn = memory_conn
+        create_indexes(conn)
+
+    return conn
+
+
+def create_indexes(conn: sqlite3.Connection) -> None:
+    """Indexes the columns that the queries below join and look up by.
+
+    SQLite only allows temporary indexes on temporary tables, so these are created in
+    the database itself, which should therefore be a copy, see `connect`.
+    """
+
+    cur = conn.cursor()
+    cur.execute("CREATE INDEX IF NOT EXISTS cim2linkml_attribute_object_id ON t_attribute (Object_ID)")
+    cur.execute("CREATE INDEX IF NOT EXISTS cim2linkml_connector_start_object_id ON t_connector (Start_Object_ID)")
+    cur.execute("CREATE INDEX IF NOT EXISTS cim2linkml_connector_end_object_id ON t_connector (End_Object_ID)")
+    cur.execute("CREATE INDEX IF NOT EXISTS cim2linkml_object_name ON t_object (Name)")
 
 
 def read_uml_project(
     conn: sqlite3.Connection,
+    packages: Optional[Iterable[tuple[str, bool]]] = None,
 ) -> tuple[sqlite3.Cursor, sqlite3.Cursor, sqlite3.Cursor]:
-    uml_package_results = read_uml_packages(conn)
-    uml_class_results = read_uml_classes(conn)
-    uml_relation_results = read_uml_relations(conn)
+    """Reads the UML project, or only the part of it needed to generate schemas for `packages`.
+
+    These are pairs of a qualified package name and whether to ignore its subpackages.
+    See `select_uml_packages` for what is part of a package selection.
+    """
+
+    selected_only = packages is not None
+    if selected_only:
+        select_uml_packages(conn, packages)
+
+    uml_package_results = read_uml_packages(conn, selected_only)
+    uml_class_results = read_uml_classes(conn, selected_only)
+    uml_relation_results = read_uml_relations(conn, selected_only)
 
     return uml_package_results, uml_class_results, uml_relation_results
 
 
-def read_uml_relations(conn: sqlite3.Connection) -> sqlite3.Cursor:
-    conn.row_factory = sqlite3.Row
+def select_uml_packages(conn: sqlite3.Connection, packages: Iterable[tuple[str, bool]]) -> None:
+    """Selects the packages (subtrees) with the given qualified names and everything they depend on.
+
+    That is, the classes in the selected packages and, transitively, the classes they
+    reference through attribute types, generalizations and associations. Also selected
+    are the packages of all these classes and their ancestors, which qualify their names.
+
+    The selection is stored in temporary tables, which the `read_uml_*` functions
+    restrict themselves to when passed `selected_only`.
+    """
+
+    cur = conn.cursor()
+
+    cur.execute("DROP TABLE IF EXISTS temp.selected_subtree")
+    cur.execute("CREATE TEMP TABLE selected_subtree (id INTEGER PRIMARY KEY)")
+    cur.executemany(
+        textwrap.dedent(
+            """
+            INSERT OR IGNORE INTO temp.selected_subtree
+
+            -- Qualified names leave out the root package, like `Packages.get_qualified_name`.
+            WITH RECURSIVE qualified_package(id, qname) AS (
+                SELECT Package_ID, ''
+                FROM t_package
+                WHERE Parent_ID = 0 OR Parent_ID IS NULL
+
+                UNION ALL
+
+                SELECT Package.Package_ID, iif(Parent.qname = '', Package.Name, Parent.qname || '.' || Package.Name)
+                FROM t_package AS Package
+                JOIN qualified_package AS Parent
+                ON Package.Parent_ID = Parent.id
+            ),
+            subtree(id) AS (
+                SELECT id
+                FROM qualified_package
+                WHERE qname = :package
+
+                UNION
+
+                SELECT Package.Package_ID
+                FROM t_package AS Package
+                JOIN subtree
+                ON Package.Parent_ID = subtree.id
+                WHERE NOT :ignore_subpackages
+            )
+            SELECT id
+            FROM subtree
+            """
+        ),
+        [{"package": package, "ignore_subpackages": ignore_subpackages} for package, ignore_subpackages in packages],
+    )
+
+    # The closure joins only the classes it reaches with their attributes and connectors. When the
+    # QEA file has no indexes on the columns joined on, SQLite indexes them automatically.
+    cur.execute("DROP TABLE IF EXISTS temp.selected_class")
+    cur.execute("CREATE TEMP TABLE selected_class (id INTEGER PRIMARY KEY)")
+    cur.execute(
+        textwrap.dedent(
+            """
+            INSERT INTO temp.selected_class
+
+            WITH RECURSIVE dependency_closure(id) AS (
+                SELECT Object_ID
+                FROM t_object
+                WHERE Object_Type = "Class"
+                AND Package_ID IN temp.selected_subtree
+
+                UNION
+
+                SELECT Type.Object_ID
+                FROM dependency_closure
+                JOIN t_attribute AS Attribute
+                ON Attribute.Object_ID = dependency_closure.id
+                JOIN t_object AS Type
+                ON Type.Name = Attribute.Type
+                AND Type.Object_Type = "Class"
+
+                UNION
+
+                SELECT Connector.End_Object_ID
+                FROM dependency_closure
+                JOIN t_connector AS Connector
+                ON Connector.Start_Object_ID = dependency_closure.id
+                WHERE Connector.Connector_Type NOT IN ("Dependency", "NoteLink")
+
+                UNION
+
+                SELECT Connector.Start_Object_ID
+                FROM dependency_closure
+                JOIN t_connector AS Connector
+                ON Connector.End_Object_ID = dependency_closure.id
+                WHERE Connector.Connector_Type NOT IN ("Dependency", "NoteLink", "Generalization")
+            )
+            SELECT id
+            FROM dependency_closure
+            """
+        )
+    )
+
+    cur.execute("DROP TABLE IF EXISTS temp.selected_package")
+    cur.execute("CREATE TEMP TABLE selected_package (id INTEGER PRIMARY KEY)")
+    cur.execute(
+        textwrap.dedent(
+            """
+            INSERT INTO temp.selected_package
+
+            WITH RECURSIVE package_closure(id) AS (
+                SELECT id
+                FROM temp.selected_subtree
+
+                UNION
+
+                SELECT Package_ID
+                FROM t_object
+                WHERE Object_ID IN temp.selected_class
+
+                UNION
+
+                SELECT Package.Parent_ID
+                FROM t_package AS Package
+                JOIN package_closure
+                ON Package.Package_ID = package_closure.id
+            )
+            SELECT id
+            FROM package_closure
+            WHERE id IS NOT NULL
+            """
+        )
+    )
+
+
+def read_uml_relations(conn: sqlite3.Connection, selected_only: bool = False) -> sqlite3.Cursor:
     cur = conn.cursor()
+    cur.row_factory = None
 
     query = textwrap.dedent(
         """
         SELECT
-            Connector_ID AS id,
-            Connector_Type AS type,
-            Start_Object_ID AS start_object_id,
-            End_Object_ID AS end_object_id,
-            Direction AS direction,
-            SubType AS sub_type,
-            SourceCard AS source_card,
-            SourceRole AS source_role,
-            SourceRoleNote AS source_role_note,
-            DestCard AS dest_card,
-            DestRole AS dest_role,
-            DestRoleNote AS dest_role_note
+        {columns}
         FROM t_connector
 
         WHERE type  NOT IN ("Dependency", "NoteLink")
+        {selection}
 
         ORDER BY id
         """
+    ).format(
+        columns=_UML_RELATION_COLUMNS,
+        selection=(
+            "AND start_object_id IN temp.selected_class AND end_object_id IN temp.selected_class"
+            if selected_only
+            else ""
+        ),
     )
     rows = cur.execute(query)
 
     return rows
 
 
-def read_uml_packages(conn: sqlite3.Connection) -> sqlite3.Cursor:
-    conn.row_factory = sqlite3.Row
+def read_uml_packages(conn: sqlite3.Connection, selected_only: bool = False) -> sqlite3.Cursor:
     cur = conn.cursor()
+    cur.row_factory = None
 
     query = textwrap.dedent(
         """
@@ -64,47 +294,163 @@ def read_uml_packages(conn: sqlite3.Connection) -> sqlite3.Cursor:
         ON Package.Package_ID = Object.Object_ID
         AND Object.Object_Type = "Package"
 
+        {selection}
+
         ORDER BY id
         """
-    )
+    ).format(selection="WHERE id IN temp.selected_package" if selected_only else "")
     rows = cur.execute(query)
 
     return rows
 
 
-def read_uml_classes(conn: sqlite3.Connection) -> sqlite3.Cursor:
-    conn.row_factory = sqlite3.Row
+def read_uml_classes(conn: sqlite3.Connection, selected_only: bool = False) -> sqlite3.Cursor:
     cur = conn.cursor()
+    cur.row_factory = None
 
     query = textwrap.dedent(
         """
         SELECT
-            Class.Object_ID AS class_id,
-            Class.Name AS class_name,
-            Class.Author AS class_author,
-            Class.Package_ID AS class_package_id,
-            Class.CreatedDate AS class_created_date,
-            Class.ModifiedDate AS class_modified_date,
-            Class.Stereotype AS class_stereotype,
-            Class.Note AS class_note,
-            Attribute.ID AS attr_id,
-            Attribute.Name AS attr_name,
-            Attribute.LowerBound AS attr_lower_bound,
-            Attribute.UpperBound AS attr_upper_bound,
-            Attribute.Type AS attr_type,
-            Attribute.Notes AS attr_notes,
-            Attribute.Stereotype AS attr_stereotype,
-            Attribute."Default" AS attr_default
+        {columns}
         FROM t_object AS Class
 
         LEFT JOIN t_attribute AS Attribute
         ON Class.Object_ID = Attribute.Object_ID
 
         WHERE Class.Object_Type = "Class"
+        {selection}
+
+        ORDER BY Class.Object_ID, Attribute.Name, Attribute.ID
+        """
+    ).format(
+        # The unary `+` keeps SQLite from looking up the selected classes one by one, which
+        # would have it scan the attributes per class when `t_attribute` is not indexed.
+        columns=_UML_CLASS_COLUMNS,
+        selection="AND +Class.Object_ID IN temp.selected_class" if selected_only else "",
+    )
+    rows = cur.execute(query)
+
+    return rows
+
+
+# The `read_uml_*_keys` and `read_uml_*_by_id` functions below serve `lazy_model`, which
+# reads the (small) keys of all classes and relations up front, and everything else
+# by primary key, only when needed. Neither requires the QEA file to have any indexes.
+# IDs are passed as a single JSON array, so that every lookup reuses the same prepared
+# statement, however many IDs it is for.
+
+
+def read_uml_class_keys(conn: sqlite3.Connection) -> sqlite3.Cursor:
+    """Reads the ID, name and package ID of every class, ordered by ID."""
+
+    cur = conn.cursor()
+    cur.row_factory = None
 
-        ORDER BY Class.Object_ID, Attribute.Name
+    query = textwrap.dedent(
+        """
+        SELECT
+            Object_ID AS id,
+            Name AS name,
+            Package_ID AS package_id
+        FROM t_object
+        WHERE Object_Type = "Class"
+        ORDER BY id
+        """
+    )
+    rows = cur.execute(query)
+
+    return rows
+
+
+def read_uml_attribute_keys(conn: sqlite3.Connection) -> sqlite3.Cursor:
+    """Reads the class ID and ID of every attribute, ordered by class ID."""
+
+    cur = conn.cursor()
+    cur.row_factory = None
+
+    query = textwrap.dedent(
+        """
+        SELECT
+            Object_ID AS class_id,
+            ID AS id
+        FROM t_attribute
+        ORDER BY class_id, id
+        """
+    )
+    rows = cur.execute(query)
+
+    return rows
+
+
+def read_uml_relation_keys(conn: sqlite3.Connection) -> sqlite3.Cursor:
+    """Reads the ID, type, source and destination class ID of every relation, ordered by ID."""
+
+    cur = conn.cursor()
+    cur.row_factory = None
+
+    query = textwrap.dedent(
+        """
+        SELECT
+            Connector_ID AS id,
+            Connector_Type AS type,
+            Start_Object_ID AS start_object_id,
+            End_Object_ID AS end_object_id
+        FROM t_connector
+        WHERE type NOT IN ("Dependency", "NoteLink")
+        ORDER BY id
         """
     )
     rows = cur.execute(query)
 
     return rows
+
+
+def read_uml_class_by_id(
+    conn: sqlite3.Connection, class_id: int, attribute_ids: Iterable[int] = ()
+) -> sqlite3.Cursor:
+    """Reads the rows of a single class, like `read_uml_classes`, joined with the attributes with the given IDs."""
+
+    cur = conn.cursor()
+    cur.row_factory = None
+
+    query = textwrap.dedent(
+        """
+        SELECT
+        {columns}
+        FROM t_object AS Class
+
+        LEFT JOIN t_attribute AS Attribute
+        ON Attribute.ID IN (SELECT value FROM json_each(?))
+        AND Class.Object_ID = Attribute.Object_ID
+
+        WHERE Class.Object_ID = ?
+        AND Class.Object_Type = "Class"
+
+        ORDER BY Attribute.Name, Attribute.ID
+        """
+    ).format(columns=_UML_CLASS_COLUMNS)
+    rows = cur.execute(query, (json.dumps(list(attribute_ids)), class_id))
+
+    return rows
+
+
+def read_uml_relations_by_id(conn: sqlite3.Connection, relation_ids: Iterable[int]) -> sqlite3.Cursor:
+    """Reads the relations with the given IDs, like `read_uml_relations`."""
+
+    cur = conn.cursor()
+    cur.row_factory = None
+
+    query = textwrap.dedent(
+        """
+        SELECT
+        {columns}
+        FROM t_connector
+
+        WHERE id IN (SELECT value FROM json_each(?))
+
+        ORDER BY id
+        """
+    ).format(columns=_UML_RELATION_COLUMNS)
+    rows = cur.execute(query, (json.dumps(list(relation_ids)),))
+
+    return rows
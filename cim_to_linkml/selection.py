@@ -0,0 +1,83 @@
+import os
+from pathlib import Path
+from typing import NamedTuple
+
+import yaml
+
+import cim_to_linkml.uml_model as uml_model
+
+
+class Selection(NamedTuple):
+    """A package to generate schemas for, and how."""
+
+    package: str
+    single_schema: bool = False
+    ignore_subpackages: bool = False
+    output_dir: Path = Path("schemas")
+
+    def describe(self) -> str:
+        return f"{self.package}{' (ignoring subpackages)' if self.ignore_subpackages else ''}"
+
+
+def load_selection_file(selection_file: os.PathLike | str, defaults: Selection) -> list[Selection]:
+    """Loads the selections listed in a YAML file.
+
+    The file holds a list of selections, each a mapping with a `package` and
+    optionally `single_schema`, `ignore_subpackages` and `output_dir`, e.g.
+
+        - package: TC57CIM.IEC61970.Base.Core
+        - package: TC57CIM.IEC61968
+          single_schema: true
+          output_dir: schemas/iec61968
+
+    Missing options are taken from `defaults`. Relative output directories are
+    relative to the directory of the file.
+    """
+
+    with open(selection_file) as f:
+        try:
+            data = yaml.safe_load(f)
+        except yaml.YAMLError as e:
+            raise ValueError(f"Invalid YAML: {e}") from e
+
+    if not isinstance(data, list):
+        raise ValueError("Expected a list of selections.")
+
+    base_dir = Path(selection_file).parent
+    selections = []
+    for i, entry in enumerate(data):
+        if not isinstance(entry, dict) or not isinstance(entry.get("package"), str):
+            raise ValueError(f"Selection {i + 1} is not a mapping with a `package'.")
+
+        unknown_keys = entry.keys() - Selection._fields
+        if unknown_keys:
+            raise ValueError(f"Selection {i + 1} has unknown options: {', '.join(sorted(unknown_keys))}.")
+
+        for key in ("single_schema", "ignore_subpackages"):
+            if not isinstance(entry.get(key, False), bool):
+                raise ValueError(f"Option `{key}' of selection {i + 1} is not a boolean.")
+
+        selection = defaults._replace(**entry)
+        if "output_dir" in entry:
+            selection = selection._replace(output_dir=base_dir / entry["output_dir"])
+        selections.append(selection)
+
+    return selections
+
+
+def resolve_selection(
+    selection: Selection, uml_project: uml_model.Project, use_imports: bool = False
+) -> tuple[bool, list[uml_model.Package]]:
+    """Returns whether the selection becomes a single schema, and the packages it selects.
+
+    Leaf packages and packages whose subpackages are ignored always become a single
+    schema, unless elements are imported rather than inlined. Raises a `KeyError` for
+    unknown packages.
+    """
+
+    uml_package = uml_project.packages.by_qualified_name[selection.package]
+
+    if selection.ignore_subpackages or uml_project.packages.is_leaf_package(selection.package):
+        return not use_imports, [uml_package]
+
+    return selection.single_schema, uml_project.packages.get_subtree(uml_package.id)
@@ -0,0 +1,274 @@
+import logging
+import os
+import signal
+import socketserver
+import stat
+import sys
+import threading
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Optional, cast
+from urllib.parse import parse_qs, urlsplit
+
+import click
+
+import cim_to_linkml.linkml_model as linkml_model
+from cim_to_linkml.api import iter_schemas
+from cim_to_linkml.cache import get_default_cache_dir
+from cim_to_linkml.generator import GenerationContext, get_generation_date
+from cim_to_linkml.lazy_model import LazyProject
+from cim_to_linkml.loader import load_uml_project
+from cim_to_linkml.selection import Selection
+from cim_to_linkml.writer import Format, serialize_schema
+
+CONTENT_TYPES: dict[Format, str] = {"yaml": "application/yaml", "json": "application/json"}
+
+LOG_FORMAT = "[%(asctime)s] [%(levelname)s] %(message)s"
+
+logger = logging.getLogger(__name__)
+
+
+class UnknownPackageError(LookupError):
+    """Raised for selections of packages that are not in the project."""
+
+
+class SchemaService:
+    """Generates schemas on demand, keeping the parsed project and generation caches in memory.
+
+    The entire project is loaded, so any package can be asked for. It is loaded again
+    when the size or modification time of the QEA file changes. Should that fail, e.g.
+    because the file is still being written or was removed, the previous project keeps
+    being served, and loading is tried again on the next request.
+
+    With `lazy`, only the keys of the project are loaded, and classes and relations are
+    read from the QEA file as requests need them, see `lazy_model`.
+    """
+
+    def __init__(
+        self,
+        qea_file: os.PathLike,
+        cache_dir: os.PathLike = get_default_cache_dir(),
+        no_cache: bool = False,
+        reproducible: bool = False,
+        lazy: bool = False,
+    ) -> None:
+        self.qea_file = qea_file
+        self.cache_dir = cache_dir
+        self.no_cache = no_cache
+        self.reproducible = reproducible
+        self.lazy = lazy
+        self._ctx: Optional[GenerationContext] = None
+        self._qea_file_stat: Optional[tuple[int, int]] = None
+        self._lock = threading.Lock()
+
+    def reload_if_changed(self) -> GenerationContext:
+        with self._lock:
+            return self._reload_if_changed()
+
+    def _reload_if_changed(self) -> GenerationContext:
+        try:
+            qea_file_stat = os.stat(self.qea_file)
+            qea_file_stat = (qea_file_stat.st_size, qea_file_stat.st_mtime_ns)
+
+            if self._ctx is None or qea_file_stat != self._qea_file_stat:
+                logger.info(f"Loading `{self.qea_file}'.")
+                if self.lazy:
+                    uml_project = LazyProject(self.qea_file)
+                else:
+                    uml_project = load_uml_project(self.qea_file, None, self.cache_dir, self.no_cache)
+
+                if self._ctx is not None:
+                    self._ctx.clear()
+                    if isinstance(self._ctx.uml_project, LazyProject):
+                        self._ctx.uml_project.close()
+                self._ctx = GenerationContext(uml_project, self.reproducible)
+                self._qea_file_stat = qea_file_stat
+        except Exception:
+            if self._ctx is None:
+                raise
+            logger.exception(f"Failed to load `{self.qea_file}', serving the previously loaded project.")
+
+        return self._ctx
+
+    def generate(self, selection: Selection, use_imports: bool = False) -> dict[str, linkml_model.Schema]:
+        """Generates the schemas of the selection, by qualified package name.
+
+        That is a single schema named after the selected package, unless the selection
+        creates a schema per package. Raises an `UnknownPackageError` for unknown packages.
+        """
+
+        with self._lock:
+            ctx = self._reload_if_changed()
+            if selection.package not in ctx.uml_project.packages.by_qualified_name:
+                raise UnknownPackageError(selection.package)
+            ctx.generation_date = get_generation_date(self.reproducible)
+
+            return dict(iter_schemas(selection, ctx, use_imports))
+
+
+class SchemaRequestHandler(BaseHTTPRequestHandler):
+    """Answers `GET /schema?package=<qualified name>`, see `cli` for the parameters."""
+
+    server_version = "cim2linkml"
+
+    def do_GET(self) -> None:
+        url = urlsplit(self.path)
+        if url.path != "/schema":
+            self.send_error(HTTPStatus.NOT_FOUND)
+            return
+
+        params = {name: values[-1] for name, values in parse_qs(url.query).items()}
+        package = params.get("package")
+        mode = params.get("mode", "single")
+        format = params.get("format", "yaml")
+        ignore_subpackages = params.get("ignore_subpackages", "false") in ("1", "true")
+        use_imports = params.get("imports", "false") in ("1", "true")
+
+        if not package:
+            self.send_error(HTTPStatus.BAD_REQUEST, "Missing `package'.")
+            return
+        if mode not in ("single", "per-package"):
+            self.send_error(HTTPStatus.BAD_REQUEST, f"Unknown mode: `{mode}'.")
+            return
+        if format not in CONTENT_TYPES:
+            self.send_error(HTTPStatus.BAD_REQUEST, f"Unknown format: `{format}'.")
+            return
+        format = cast(Format, format)
+        if use_imports and mode == "single":
+            self.send_error(HTTPStatus.BAD_REQUEST, "Imports require the `per-package' mode.")
+            return
+
+        selection = Selection(package, single_schema=mode == "single", ignore_subpackages=ignore_subpackages)
+        assert isinstance(self.server, (SchemaHTTPServer, SchemaUnixHTTPServer))
+        try:
+            schemas = self.server.service.generate(selection, use_imports)
+            body = serialize_schema(schemas[package] if mode == "single" else schemas, format)
+        except UnknownPackageError:
+            self.send_error(HTTPStatus.NOT_FOUND, f"Unknown package: `{package}'.")
+            return
+        except Exception:
+            logger.exception(f"Failed to generate the schemas of `{package}'.")
+            self.send_error(HTTPStatus.INTERNAL_SERVER_ERROR)
+            return
+
+        self.send_response(HTTPStatus.OK)
+        self.send_header("Content-Type", f"{CONTENT_TYPES[format]}; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def address_string(self) -> str:
+        # Clients of Unix sockets have no address.
+        return self.client_address[0] if isinstance(self.client_address, tuple) else "local"
+
+
+class SchemaHTTPServer(ThreadingHTTPServer):
+    service: SchemaService
+
+
+class SchemaUnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+    service: SchemaService
+
+
+@click.command()
+@click.argument("cim_db", type=click.Path(exists=True, dir_okay=False, path_type=Path), nargs=1, metavar="QEA_FILE")
+@click.option("--host", default="127.0.0.1", show_default=True, help="Address to listen on.")
+@click.option("--port", default=8000, show_default=True, type=click.IntRange(min=0), help="Port to listen on.")
+@click.option(
+    "--socket",
+    "socket_path",
+    type=click.Path(dir_okay=False, path_type=Path),
+    help="If passed, listen on this Unix socket instead of a TCP port.",
+)
+@click.option(
+    "--reproducible",
+    is_flag=True,
+    default=False,
+    show_default=True,
+    help="If passed, the generation date of the schemas is taken from $SOURCE_DATE_EPOCH if set, "
+    "and omitted otherwise.",
+)
+@click.option(
+    "--cache-dir",
+    default=get_default_cache_dir(),
+    show_default="$XDG_CACHE_HOME/cim2linkml",
+    type=click.Path(file_okay=False, path_type=Path),
+    help="Directory where parsed QEA files are cached.",
+)
+@click.option(
+    "--no-cache",
+    is_flag=True,
+    default=False,
+    show_default=True,
+    help="If passed, the QEA file is always read and parsed, and the result is not cached.",
+)
+@click.option(
+    "--lazy",
+    is_flag=True,
+    default=False,
+    show_default=True,
+    help="If passed, classes and relations are read from the QEA file as requests need them, rather than all "
+    "up front. This starts faster and takes less memory for very large models, but answers more slowly.",
+)
+def cli(cim_db, host, port, socket_path, reproducible, cache_dir, no_cache, lazy):
+    """
+    Serves LinkML schemas generated from the supplied Sparx EA QEA database file.
+
+
+    The QEA file is loaded once and kept in memory, along with everything generated
+    from it, and loaded again whenever it changes. Schemas are requested using
+
+        GET /schema?package=TC57CIM.IEC61970.Base.Core
+
+    which accepts the following parameters:
+
+    \b
+      package             Fully qualified package name.
+      mode                `single' (default) for a single schema, or
+                          `per-package' for a schema per package, by
+                          qualified name.
+      ignore_subpackages  `true' to only select the package itself.
+      imports             `true' to import rather than inline the elements
+                          of other packages. Requires `per-package'.
+      format              `yaml' (default) or `json'.
+
+    """
+
+    logging.basicConfig(format=LOG_FORMAT)
+
+    try:
+        get_generation_date(reproducible)
+    except ValueError as e:
+        raise click.UsageError(str(e))
+
+    service = SchemaService(cim_db, cache_dir, no_cache, reproducible, lazy)
+    service.reload_if_changed()
+
+    if socket_path:
+        if socket_path.exists() and stat.S_ISSOCK(socket_path.stat().st_mode):
+            socket_path.unlink()
+        server = SchemaUnixHTTPServer(str(socket_path), SchemaRequestHandler)
+        address = f"unix:{socket_path}"
+    else:
+        server = SchemaHTTPServer((host, port), SchemaRequestHandler)
+        address = f"http://{host}:{server.server_port}"
+    server.service = service
+
+    # Shut down cleanly, removing the socket, when terminated as well as when interrupted.
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit())
+
+    click.echo(f"Serving schemas from `{cim_db}' on {address}.", err=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if socket_path:
+            socket_path.unlink(missing_ok=True)
+
+
+if __name__ == "__main__":
+    cli.main()
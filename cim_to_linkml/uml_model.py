@@ -1,10 +1,13 @@
 import os
 from datetime import datetime
 from enum import Enum
-from functools import cached_property, lru_cache
+from functools import cached_property
 from itertools import groupby
 from operator import attrgetter, itemgetter
-from typing import Literal, NamedTuple, Optional
+from typing import TYPE_CHECKING, Literal, NamedTuple, Optional
+
+if TYPE_CHECKING:
+    from cim_to_linkml.lazy_model import LazyClasses, LazyRelations
 
 ObjectID = int
 ConnectorID = int
@@ -18,6 +21,9 @@ CardinalityValue = int | Many
 
 QEAFile = os.PathLike | str
 
+# Stands in for dates missing from the QEA file, so that these compare equal between runs.
+UNKNOWN_DATE = datetime.min
+
 
 class Cardinality(NamedTuple):
     lower_bound: CardinalityValue = 0
@@ -56,15 +62,35 @@ class AttributeStereotype(Enum):
     DEPRECATED = "deprecated"
 
 
+def parse_date(val: Optional[str]) -> datetime:
+    """Parses a date as stored in the QEA file, or returns `UNKNOWN_DATE` if there is none."""
+
+    if val is None:
+        return UNKNOWN_DATE
+
+    return datetime.fromisoformat(val)
+
+
+# `created` and `modified` hold the dates as stored in the QEA file, parsed by the `*_date` properties.
+
+
 class Package(NamedTuple):
     id: ObjectID
     name: PackageName
     notes: Optional[str] = None
     author: Optional[str] = None
-    created_date: datetime = datetime.now()
-    modified_date: datetime = datetime.now()
+    created: Optional[str] = None
+    modified: Optional[str] = None
     parent: Optional[ObjectID] = None
 
+    @property
+    def created_date(self) -> datetime:
+        return parse_date(self.created)
+
+    @property
+    def modified_date(self) -> datetime:
+        return parse_date(self.modified)
+
 
 class Attribute(NamedTuple):
     id: AttributeID
@@ -83,12 +109,20 @@ class Class(NamedTuple):
     name: ClassName
     package: ObjectID
     attributes: tuple[Attribute, ...]
-    created_date: datetime = datetime.now()
-    modified_date: datetime = datetime.now()
+    created: Optional[str] = None
+    modified: Optional[str] = None
     author: Optional[str] = None
     note: Optional[str] = None
     stereotype: Optional[ClassStereotype] = None
 
+    @property
+    def created_date(self) -> datetime:
+        return parse_date(self.created)
+
+    @property
+    def modified_date(self) -> datetime:
+        return parse_date(self.modified)
+
 
 class Relation(NamedTuple):
     id: ConnectorID
@@ -105,6 +139,13 @@ class Relation(NamedTuple):
     dest_role_note: Optional[str] = None
 
 
+class Neighbours(NamedTuple):
+    """Classes a class is associated with through non-generalization relations."""
+
+    incoming: tuple[ObjectID, ...] = ()  # Source classes of relations ending at the class.
+    outgoing: tuple[ObjectID, ...] = ()  # Destination classes of relations starting at the class.
+
+
 class Classes:
     def __init__(self, classes):
         self._data = classes
@@ -172,6 +213,50 @@ class Relations:
 
         return relations_by_dest_class
 
+    @cached_property
+    def associations_by_source_class(self):
+        return {
+            source_class: [r for r in relations if r.type != RelationType.GENERALIZATION]
+            for source_class, relations in self.by_source_class.items()
+        }
+
+    @cached_property
+    def associations_by_dest_class(self):
+        return {
+            dest_class: [r for r in relations if r.type != RelationType.GENERALIZATION]
+            for dest_class, relations in self.by_dest_class.items()
+        }
+
+    @cached_property
+    def generalization_by_source_class(self):
+        relations_by_source_class = {}
+        for r in self.by_id.values():
+            if r.type == RelationType.GENERALIZATION:
+                relations_by_source_class.setdefault(r.source_class, r)
+
+        return relations_by_source_class
+
+    @cached_property
+    def neighbours(self):
+        """Non-generalization adjacency of every class, built in a single pass over the relations.
+
+        A relation from a class to itself only counts as outgoing.
+        """
+
+        incoming = {}
+        outgoing = {}
+        for r in self.by_id.values():
+            if r.type == RelationType.GENERALIZATION:
+                continue
+            outgoing.setdefault(r.source_class, []).append(r.dest_class)
+            if r.dest_class != r.source_class:
+                incoming.setdefault(r.dest_class, []).append(r.source_class)
+
+        return {
+            class_id: Neighbours(incoming=tuple(incoming.get(class_id, ())), outgoing=tuple(outgoing.get(class_id, ())))
+            for class_id in incoming.keys() | outgoing.keys()
+        }
+
 
 class Packages:
     def __init__(self, packages):
@@ -185,27 +270,65 @@ class Packages:
     def by_qualified_name(self):
         return {self.get_qualified_name(p_id): p for p_id, p in self.by_id.items()}
 
-    @lru_cache(maxsize=173)
-    def get_qualified_name(self, package_id):
-        return ".".join(self._get_package_path(package_id))
+    @cached_property
+    def children(self):
+        children = {p_id: [] for p_id in self.by_id}
+        for p in self.by_id.values():
+            if p.parent in children:
+                children[p.parent].append(p.id)
 
-    def is_leaf_package(self, qname: str):
-        return len([qn for qn in self.by_qualified_name if qn.startswith(qname)]) == 1
+        return children
 
-    def _get_package_path(self, start_pkg_id, package_path=None):
-        if package_path is None:
-            package_path = []
+    @cached_property
+    def qualified_names(self):
+        """Computes all qualified names top-down, in a single pass over the package tree.
+
+        The root package itself is not part of qualified names.
+        """
+
+        qualified_names = {}
+        worklist = [(p.id, "") for p in self.by_id.values() if p.parent in (0, None)]
+        while worklist:
+            package_id, qname = worklist.pop()
+            qualified_names[package_id] = qname
+            for child_id in self.children[package_id]:
+                name = self.by_id[child_id].name
+                worklist.append((child_id, f"{qname}.{name}" if qname else name))
+
+        return {p_id: qualified_names[p_id] for p_id in self.by_id if p_id in qualified_names}
+
+    def get_qualified_name(self, package_id):
+        return self.qualified_names[package_id]
+
+    def get_subtree(self, package_id) -> list[Package]:
+        """Returns the package and all of its (nested) subpackages, ordered by ID."""
 
-        package = self.by_id[start_pkg_id]
+        subtree_ids = []
+        worklist = [package_id]
+        while worklist:
+            p_id = worklist.pop()
+            subtree_ids.append(p_id)
+            worklist.extend(self.children[p_id])
 
-        if package.parent in (0, None):
-            return package_path
+        return [self.by_id[p_id] for p_id in sorted(subtree_ids)]
 
-        return self._get_package_path(package.parent, [package.name] + package_path)
+    def is_leaf_package(self, qname: str):
+        package = self.by_qualified_name.get(qname)
+        return package is not None and not self.children[package.id]
 
 
 class Project:
-    def __init__(self, packages: Packages, classes: Classes, relations: Relations) -> None:
+    def __init__(
+        self, packages: Packages, classes: "Classes | LazyClasses", relations: "Relations | LazyRelations"
+    ) -> None:
         self.packages = packages
         self.classes = classes
         self.relations = relations
+
+    def build_indexes(self) -> None:
+        """Builds all lookup indexes up front, rather than on first access."""
+
+        for collection in (self.packages, self.classes, self.relations):
+            for name, attr in vars(type(collection)).items():
+                if isinstance(attr, cached_property):
+                    getattr(collection, name)
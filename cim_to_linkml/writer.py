@@ -1,18 +1,26 @@
+import bz2
+import gzip
+import io
+import json
+import lzma
 import os
-from typing import Optional
+import queue
+import tarfile
+import threading
+import zipfile
+from datetime import datetime, timezone
+from pathlib import PurePath
+from typing import IO, Any, BinaryIO, Literal, Optional, cast
 
 import yaml
 
 import cim_to_linkml.linkml_model as linkml_model
+from cim_to_linkml.metrics import Metrics
 
-
-def init_yaml_serializer():
-    yaml.add_representer(type(None), represent_none)
-    yaml.add_representer(linkml_model.Slot, represent_linkml_slot)
-    yaml.add_representer(linkml_model.Class, represent_linkml_class)
-    yaml.add_representer(linkml_model.Enum, represent_linkml_enum)
-    yaml.add_representer(linkml_model.PermissibleValue, represent_linkml_permissible_value)
-    yaml.add_representer(linkml_model.Schema, represent_linkml_schema)
+try:
+    import orjson
+except ImportError:  # Falls back to the (slower) standard library.
+    orjson = None
 
 
 def represent_none(self, _):
@@ -21,36 +29,427 @@ def represent_none(self, _):
     return self.represent_scalar("tag:yaml.org,2002:null", "")
 
 
-def represent_linkml_schema(dumper, data):
-    d = {k: v for k, v in data._asdict().items() if v not in [[], {}, None]}
+# The fields written for each kind of LinkML element. Empty fields are left out, as are
+# the names of elements, which are the keys they are listed under already.
 
-    return dumper.represent_dict(d)
 
+def get_linkml_schema_fields(data: linkml_model.Schema) -> dict:
+    return {k: v for k, v in data._asdict().items() if v not in [[], {}, None]}
 
-def represent_linkml_permissible_value(dumper, data):
-    d = {k: v for k, v in data._asdict().items() if v is not None}
 
-    return dumper.represent_dict(d)
+def get_linkml_permissible_value_fields(data: linkml_model.PermissibleValue) -> dict:
+    return {k: v for k, v in data._asdict().items() if v is not None}
 
 
-def represent_linkml_enum(dumper, data):
-    d = {k: v for k, v in data._asdict().items() if k not in ["name"] if v not in [[], {}, None]}
+def get_linkml_element_fields(data: linkml_model.Enum | linkml_model.Class | linkml_model.Slot) -> dict:
+    return {k: v for k, v in data._asdict().items() if k not in ["name"] if v not in [[], {}, None]}
 
-    return dumper.represent_dict(d)
 
+_FIELD_GETTERS = {
+    linkml_model.Schema: get_linkml_schema_fields,
+    linkml_model.PermissibleValue: get_linkml_permissible_value_fields,
+    linkml_model.Enum: get_linkml_element_fields,
+    linkml_model.Class: get_linkml_element_fields,
+    linkml_model.Slot: get_linkml_element_fields,
+}
 
-def represent_linkml_class(dumper, data):
-    d = {k: v for k, v in data._asdict().items() if k not in ["name"] if v not in [[], {}, None]}
 
-    return dumper.represent_dict(d)
+def represent_linkml_schema(dumper, data):
+    return dumper.represent_dict(get_linkml_schema_fields(data))
+
+
+def represent_linkml_permissible_value(dumper, data):
+    return dumper.represent_dict(get_linkml_permissible_value_fields(data))
+
+
+def represent_linkml_enum(dumper, data):
+    return dumper.represent_dict(get_linkml_element_fields(data))
+
+
+def represent_linkml_class(dumper, data):
+    return dumper.represent_dict(get_linkml_element_fields(data))
 
 
 def represent_linkml_slot(dumper, data):
-    d = {k: v for k, v in data._asdict().items() if k not in ["name"] if v not in [[], {}, None]}
+    return dumper.represent_dict(get_linkml_element_fields(data))
+
+
+class SchemaDumper(yaml.Dumper):
+    """Dumps LinkML schemas.
+
+    The representers are registered on this class only, leaving PyYAML's default
+    dumpers untouched.
+    """
+
+
+# PyYAML built without libyaml has no CDumper.
+_LibyamlDumper: Any = yaml.CDumper if yaml.__with_libyaml__ else yaml.Dumper
+
+
+class FastSchemaDumper(_LibyamlDumper):
+    """Dumps LinkML schemas like `SchemaDumper`, using libyaml when available.
+
+    libyaml breaks long double-quoted strings across lines differently than PyYAML
+    does, so these raise `_DoubleQuotedScalar`, and the entries holding them are
+    dumped with `SchemaDumper` instead, see `_dump_yaml_spliced`.
+    """
+
+
+class _DoubleQuotedScalar(Exception):
+    pass
+
+
+# PyYAML's emitter, only used to tell how it would write a string.
+_scalar_analyzer = yaml.emitter.Emitter(io.StringIO())
+
+
+def _represent_str_unless_double_quoted(dumper, data):
+    # Strings of printable ASCII are written plain or single-quoted; only others need analyzing.
+    if not (data.isascii() and data.isprintable()) and not _scalar_analyzer.analyze_scalar(data).allow_single_quoted:
+        raise _DoubleQuotedScalar(data)
+
+    return dumper.represent_str(data)
+
+
+for _dumper in [SchemaDumper, FastSchemaDumper]:
+    _dumper.add_representer(type(None), represent_none)
+    _dumper.add_representer(linkml_model.Slot, represent_linkml_slot)
+    _dumper.add_representer(linkml_model.Class, represent_linkml_class)
+    _dumper.add_representer(linkml_model.Enum, represent_linkml_enum)
+    _dumper.add_representer(linkml_model.PermissibleValue, represent_linkml_permissible_value)
+    _dumper.add_representer(linkml_model.Schema, represent_linkml_schema)
+
+if yaml.__with_libyaml__:
+    FastSchemaDumper.add_representer(str, _represent_str_unless_double_quoted)
+
+
+Format = Literal["yaml", "json"]
+
+FILE_EXTENSIONS: dict[Format, str] = {"yaml": ".yml", "json": ".json"}
+
+# LinkML finds an imported schema by adding `.yaml` to the import, so schemas importing
+# one another are written with that extension instead.
+IMPORTS_FILE_EXTENSION = ".yaml"
+
+
+def serialize_schema(schema: Any, format: Format = "yaml") -> bytes:
+    """Serializes the schema, or any structure of lists and dicts holding schemas, to UTF-8."""
+
+    match format:
+        case "yaml":
+            try:
+                return _dump_yaml(schema, FastSchemaDumper)
+            except _DoubleQuotedScalar:
+                return _dump_yaml_spliced(schema)
+        case "json" if orjson is not None:
+            # orjson handles everything but the LinkML elements natively, including dates.
+            return orjson.dumps(schema, default=_get_json_fields, option=orjson.OPT_INDENT_2)
+        case "json":
+            # Formatted like orjson does, so the output does not depend on whether it is installed.
+            return json.dumps(_to_json(schema), indent=2, ensure_ascii=False).encode()
+        case _:
+            raise ValueError(f"Unknown format: `{format}'.")
+
+
+def _dump_yaml(schema: Any, dumper: type) -> bytes:
+    return yaml.dump(schema, Dumper=dumper, indent=2, default_flow_style=False, sort_keys=False, encoding="utf-8")
+
+
+def _dump_yaml_spliced(data: Any, keys: tuple = ()) -> bytes:
+    """Dumps the data, nested under the keys, one entry at a time.
+
+    Entries are dumped with `FastSchemaDumper` where possible, and split further where
+    not, so only the strings it cannot write are left to the slower `SchemaDumper`.
+    Every entry of a block mapping is written the same whether dumped by itself or not,
+    so the entries are dumped nested under the same keys, and the lines of these keys
+    are dropped from all but the first entry.
+    """
+
+    get_fields = _FIELD_GETTERS.get(type(data))
+    entries = get_fields(data) if get_fields is not None else data
+    if not isinstance(entries, dict) or not entries:
+        return _dump_yaml(_nest(data, keys), SchemaDumper)
+
+    chunks = []
+    for key, value in entries.items():
+        try:
+            chunk = _dump_yaml(_nest(value, keys + (key,)), FastSchemaDumper)
+        except _DoubleQuotedScalar:
+            if _is_single_line_key(key):
+                chunk = _dump_yaml_spliced(value, keys + (key,))
+            else:
+                chunk = _dump_yaml(_nest(value, keys + (key,)), SchemaDumper)
+        if chunks:
+            chunk = chunk.split(b"\n", len(keys))[-1]
+        chunks.append(chunk)
+
+    return b"".join(chunks)
+
+
+def _nest(data: Any, keys: tuple) -> Any:
+    for key in reversed(keys):
+        data = {key: data}
+    return data
+
+
+def _is_single_line_key(key: Any) -> bool:
+    # Longer keys are written as explicit (`? `) keys, which may take several lines.
+    return isinstance(key, str) and key.isascii() and key.isprintable() and len(key) < 128
+
+
+def _get_json_fields(data: Any) -> dict:
+    try:
+        get_fields = _FIELD_GETTERS[type(data)]
+    except KeyError:
+        raise TypeError(f"Cannot serialize {type(data).__name__} to JSON.") from None
+
+    return get_fields(data)
+
+
+def _to_json(data: Any) -> Any:
+    """Turns LinkML elements into dicts of their written fields, like the YAML representers do."""
+
+    get_fields = _FIELD_GETTERS.get(type(data))
+    if get_fields is not None:
+        data = get_fields(data)
+
+    match data:
+        case dict():
+            return {k: _to_json(v) for k, v in data.items()}
+        case list() | tuple():
+            return [_to_json(v) for v in data]
+        case datetime():
+            return data.isoformat()
+        case _:
+            return data
+
+
+def write_schema(schema: linkml_model.Schema, out_file: os.PathLike | str, format: Format = "yaml") -> bool:
+    """Writes the schema, unless the file already holds exactly this content.
+
+    Unchanged files keep their modification time, so they do not trigger downstream
+    rebuilds. Returns whether the file was written.
+    """
+
+    return write_if_changed(serialize_schema(schema, format), out_file)
+
+
+def write_if_changed(content: bytes, out_file: os.PathLike | str) -> bool:
+    if _has_content(out_file, content):
+        return False
+
+    with open(out_file, "wb") as f:
+        f.write(content)
+
+    return True
+
+
+def _has_content(path: os.PathLike | str, content: bytes) -> bool:
+    try:
+        if os.path.getsize(path) != len(content):
+            return False
+        with open(path, "rb") as f:
+            return f.read() == content
+    except OSError:
+        return False
+
+
+class ThreadedSchemaWriter:
+    """Writes serialized schemas on background threads, while the caller goes on generating the next ones.
+
+    The threads only do I/O, which releases the GIL, so it overlaps with generating and
+    serializing in the calling thread. At most `max_in_flight` schemas are submitted but
+    not yet written at any time; `submit` blocks until there is room, which caps the
+    memory they take. Directories are created as needed. The first error raised by a
+    thread is raised again by `submit`, `join` or `close`, after which the remaining
+    schemas are no longer written. Times and file counts are added to `metrics` on
+    `close`.
+    """
+
+    def __init__(self, threads: int, max_in_flight: int, metrics: Metrics) -> None:
+        self.metrics = metrics
+        self._queue: queue.Queue[Optional[tuple[bytes, str, str]]] = queue.Queue()
+        self._in_flight = threading.BoundedSemaphore(max_in_flight)
+        self._error: Optional[BaseException] = None
+        # Every thread collects its own metrics, so they need no locking.
+        self._thread_metrics = [Metrics() for _ in range(threads)]
+        self._threads = [
+            threading.Thread(target=self._run, args=(thread_metrics,), daemon=True)
+            for thread_metrics in self._thread_metrics
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def __enter__(self) -> "ThreadedSchemaWriter":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def submit(self, content: bytes, out_file: str, package: str) -> None:
+        self._raise_error()
+        self._in_flight.acquire()
+        self._queue.put((content, out_file, package))
+
+    def join(self) -> None:
+        """Waits until all submitted schemas are written."""
+
+        self._queue.join()
+        self._raise_error()
+
+    def close(self) -> None:
+        for _ in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join()
+        for thread_metrics in self._thread_metrics:
+            self.metrics.merge(thread_metrics)
+        self._thread_metrics = []
+
+        self._raise_error()
+
+    def _run(self, metrics: Metrics) -> None:
+        while (item := self._queue.get()) is not None:
+            content, out_file, package = item
+            try:
+                if self._error is None:
+                    with metrics.stage("write", package):
+                        os.makedirs(os.path.dirname(out_file), exist_ok=True)
+                        written = write_if_changed(content, out_file)
+                    metrics.files["written" if written else "skipped"] += 1
+            except BaseException as e:
+                self._error = self._error or e
+            finally:
+                del content, item
+                self._in_flight.release()
+                self._queue.task_done()
+
+        self._queue.task_done()
+
+    def _raise_error(self) -> None:
+        if self._error is not None:
+            raise self._error
+
+
+# The compression of tar archives, by file extension. Anything else ending in `.tar' is not compressed.
+_TAR_COMPRESSORS = {
+    ".tar.gz": gzip.GzipFile,
+    ".tgz": gzip.GzipFile,
+    ".tar.bz2": bz2.BZ2File,
+    ".tar.xz": lzma.LZMAFile,
+}
+
+ARCHIVE_EXTENSIONS = (".zip", ".tar", *_TAR_COMPRESSORS)
+
+# Zip files cannot hold earlier dates.
+_MIN_ZIP_DATE = datetime(1980, 1, 1, tzinfo=timezone.utc)
+
+
+def get_archive_name(out_file: os.PathLike | str, root_dir: os.PathLike | str) -> str:
+    """Returns the name of a schema file in an archive: its path relative to `root_dir`, with forward slashes."""
+
+    name = PurePath(os.path.relpath(out_file, root_dir)).as_posix()
+    if name == ".." or name.startswith("../"):
+        raise ValueError(f"Cannot store `{out_file}' in an archive of `{root_dir}', since it lies outside it.")
+
+    return name
+
+
+class ArchiveSchemaWriter:
+    """Writes serialized schemas into a single zip or (compressed) tar archive, rather than a file each.
+
+    The kind of archive follows from the extension of `out_file` (see
+    `ARCHIVE_EXTENSIONS`). Schemas are stored under the paths they would be written to
+    otherwise, relative to `root_dir`, and are streamed into the archive as they are
+    submitted, so nothing but the archive touches the disk. Tar archives are written as
+    a stream, without seeking.
+
+    All entries, and the gzip header, are dated `date`, or the start of the epoch if
+    it is `None`, so archives of reproducible output are reproducible as well. When
+    used as a context manager, an archive that is not completed because of an error
+    is removed. Times and file counts are added to `metrics` as schemas are written.
+    """
+
+    def __init__(
+        self,
+        out_file: os.PathLike | str,
+        root_dir: os.PathLike | str,
+        metrics: Metrics,
+        date: Optional[datetime] = None,
+    ) -> None:
+        name = os.fspath(out_file).lower()
+        if not name.endswith(ARCHIVE_EXTENSIONS):
+            raise ValueError(
+                f"Unknown kind of archive: `{out_file}'. Its name should end in one of: "
+                + ", ".join(f"`{ext}'" for ext in ARCHIVE_EXTENSIONS)
+                + "."
+            )
+
+        self.out_file = out_file
+        self.root_dir = root_dir
+        self.metrics = metrics
+        self._timestamp = int(date.timestamp()) if date is not None else 0
+        # Zip files store local dates without a time zone, which are taken to be UTC here.
+        self._zip_date = max(datetime.fromtimestamp(self._timestamp, timezone.utc), _MIN_ZIP_DATE).timetuple()[:6]
+
+        self._file: IO[bytes] = open(out_file, "wb")
+        self._compressed: Optional[BinaryIO] = None
+        self._zip: Optional[zipfile.ZipFile] = None
+        self._tar: Optional[tarfile.TarFile] = None
+        try:
+            if name.endswith(".zip"):
+                self._zip = zipfile.ZipFile(self._file, "w", compression=zipfile.ZIP_DEFLATED)
+            else:
+                compressor = next((c for ext, c in _TAR_COMPRESSORS.items() if name.endswith(ext)), None)
+                if compressor is gzip.GzipFile:
+                    compressed = gzip.GzipFile(filename="", mode="wb", fileobj=self._file, mtime=self._timestamp)
+                    self._compressed = cast(BinaryIO, compressed)
+                elif compressor is not None:
+                    self._compressed = cast(BinaryIO, compressor(self._file, "wb"))
+                self._tar = tarfile.open(fileobj=self._compressed or self._file, mode="w|", format=tarfile.PAX_FORMAT)
+        except BaseException:
+            self._file.close()
+            raise
+
+    def __enter__(self) -> "ArchiveSchemaWriter":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+        if exc_type is not None:
+            os.remove(self.out_file)
+
+    def submit(self, content: bytes, out_file: str, package: str) -> None:
+        name = get_archive_name(out_file, self.root_dir)
+
+        with self.metrics.stage("write", package):
+            if self._zip is not None:
+                info = zipfile.ZipInfo(name, date_time=self._zip_date)
+                info.compress_type = zipfile.ZIP_DEFLATED
+                info.external_attr = 0o644 << 16
+                self._zip.writestr(info, content)
+            else:
+                assert self._tar is not None
+                info = tarfile.TarInfo(name)
+                info.size = len(content)
+                info.mtime = self._timestamp
+                info.mode = 0o644
+                self._tar.addfile(info, io.BytesIO(content))
+        self.metrics.files["written"] += 1
 
-    return dumper.represent_dict(d)
+    def join(self) -> None:
+        """Does nothing, as schemas are written as soon as they are submitted."""
 
+    def close(self) -> None:
+        if self._file.closed:
+            return
 
-def write_schema(schema: linkml_model.Schema, out_file: os.PathLike | str) -> None:
-    with open(out_file, "w") as f:
-        yaml.dump(schema, f, indent=2, default_flow_style=False, sort_keys=False)
+        try:
+            if self._zip is not None:
+                self._zip.close()
+            elif self._tar is not None:
+                self._tar.close()
+                if self._compressed is not None:
+                    self._compressed.close()
+        finally:
+            self._file.close()
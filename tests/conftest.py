@@ -0,0 +1,22 @@
+from pathlib import Path
+
+import pytest
+
+from benchmarks.synthetic_qea import SyntheticModel, build_synthetic_qea
+from tests.helpers import read_tree, run_cli
+
+
+@pytest.fixture(scope="session")
+def qea_file(tmp_path_factory) -> Path:
+    path = tmp_path_factory.mktemp("qea") / "synthetic.qea"
+    build_synthetic_qea(path, SyntheticModel(class_count=120, package_depth=2, packages_per_package=2))
+    return path
+
+
+@pytest.fixture(scope="session")
+def full_output(qea_file, tmp_path_factory) -> dict[str, bytes]:
+    """The schemas of the entire project, generated without any options that should not change them."""
+
+    out_dir = tmp_path_factory.mktemp("full_output")
+    run_cli(qea_file, "--output-dir", out_dir, "--no-cache")
+    return read_tree(out_dir)
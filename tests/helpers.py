@@ -0,0 +1,26 @@
+from pathlib import Path
+from typing import Optional
+
+from click.testing import CliRunner, Result
+
+from cim_to_linkml.main import cli
+
+SOURCE_DATE_EPOCH = "1704067200"  # 2024-01-01
+
+
+def invoke_cli(*args: str | Path, env: Optional[dict[str, str]] = None) -> Result:
+    return CliRunner().invoke(cli, [str(arg) for arg in args], env=env)
+
+
+def run_cli(*args: str | Path) -> Result:
+    """Runs `cim2linkml` reproducibly, failing the test if it fails."""
+
+    result = invoke_cli("--reproducible", *args, env={"SOURCE_DATE_EPOCH": SOURCE_DATE_EPOCH})
+    assert result.exit_code == 0, result.output
+    return result
+
+
+def read_tree(root: Path) -> dict[str, bytes]:
+    """Returns the content of every file under `root`, by its path relative to it."""
+
+    return {path.relative_to(root).as_posix(): path.read_bytes() for path in root.rglob("*") if path.is_file()}
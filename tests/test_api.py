@@ -0,0 +1,54 @@
+from contextlib import closing
+
+import pytest
+
+from cim_to_linkml.api import generate_schemas, serialize_schemas
+from cim_to_linkml.read import connect
+from tests.helpers import SOURCE_DATE_EPOCH
+
+
+@pytest.fixture(autouse=True)
+def source_date_epoch(monkeypatch):
+    monkeypatch.setenv("SOURCE_DATE_EPOCH", SOURCE_DATE_EPOCH)
+
+
+def get_schema_path(qname: str, extension: str = ".yml") -> str:
+    return qname.replace(".", "/") + extension
+
+
+def test_generates_same_schemas_as_cli(qea_file, full_output):
+    schemas = generate_schemas(qea_file, reproducible=True)
+
+    assert {get_schema_path(qname): content for qname, content in serialize_schemas(schemas)} == full_output
+
+
+def test_generates_from_connection(qea_file):
+    with closing(connect(qea_file)) as conn:
+        schemas = dict(serialize_schemas(generate_schemas(conn, "TC57CIM.Package3", reproducible=True)))
+
+    assert schemas == dict(serialize_schemas(generate_schemas(qea_file, "TC57CIM.Package3", reproducible=True)))
+
+
+def test_generates_single_schema(qea_file):
+    schemas = dict(generate_schemas(qea_file, "TC57CIM.Package3", single_schema=True, reproducible=True))
+
+    assert list(schemas) == ["TC57CIM.Package3"]
+    assert schemas["TC57CIM.Package3"].classes
+
+
+def test_serializes_json(qea_file):
+    schemas = generate_schemas(qea_file, "TC57CIM.Package3.Package5", reproducible=True)
+
+    ((qname, content),) = serialize_schemas(schemas, "json")
+    assert qname == "TC57CIM.Package3.Package5"
+    assert content.startswith(b"{")
+
+
+def test_rejects_unknown_package_before_iterating(qea_file):
+    with pytest.raises(KeyError):
+        generate_schemas(qea_file, "TC57CIM.Unknown")
+
+
+def test_rejects_imports_with_single_schema(qea_file):
+    with pytest.raises(ValueError):
+        generate_schemas(qea_file, use_imports=True, single_schema=True)
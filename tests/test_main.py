@@ -0,0 +1,241 @@
+import json
+import shutil
+import sqlite3
+import textwrap
+import zipfile
+from contextlib import closing
+from datetime import datetime
+
+import pytest
+import yaml
+
+from tests.helpers import invoke_cli, read_tree, run_cli
+
+
+def test_generates_schema_per_package(full_output):
+    assert len(full_output) > 1
+    for content in full_output.values():
+        schema = yaml.safe_load(content)
+        assert schema["generation_date"].isoformat().startswith("2024-01-01")
+
+
+def test_imports_resolve(qea_file, tmp_path):
+    schema_view = pytest.importorskip("linkml_runtime.utils.schemaview")
+    run_cli(qea_file, "--output-dir", tmp_path, "--no-cache", "--imports")
+
+    schema_files = sorted(tmp_path.rglob("*.yaml"))
+    assert schema_files
+    assert not list(tmp_path.rglob("*.yml"))
+    for schema_file in schema_files:
+        view = schema_view.SchemaView(str(schema_file))
+        imports = yaml.safe_load(schema_file.read_bytes()).get("imports", [])
+        # Resolves (and loads) every schema imported, directly or not.
+        closure = view.imports_closure()
+        assert set(imports) <= set(closure)
+        view.all_classes(imports=True)
+
+
+def test_imported_schemas_hold_all_classes_of_their_package(qea_file, tmp_path):
+    run_cli(qea_file, "--output-dir", tmp_path / "all", "--no-cache", "--imports")
+    run_cli(
+        qea_file, "--output-dir", tmp_path / "selected", "--no-cache", "--imports", "-p", "TC57CIM.Package3.Package5"
+    )
+
+    selected = read_tree(tmp_path / "selected")
+    assert len(selected) > 2
+    assert selected == {path: content for path, content in read_tree(tmp_path / "all").items() if path in selected}
+
+
+def test_rejects_imports_with_single_schema(qea_file, tmp_path):
+    result = invoke_cli(qea_file, "--output-dir", tmp_path, "--imports", "--single-schema")
+
+    assert result.exit_code == 2
+    assert "--single-schema" in result.output
+
+
+@pytest.mark.parametrize("jobs", ["2", "0"])
+def test_parallel_output_matches_sequential(qea_file, tmp_path, full_output, jobs):
+    run_cli(qea_file, "--output-dir", tmp_path, "--no-cache", "--jobs", jobs)
+
+    assert read_tree(tmp_path) == full_output
+
+
+def test_parallel_schemas_share_generation_date(qea_file, tmp_path):
+    # Not reproducible, so that every process takes the current date.
+    result = invoke_cli(qea_file, "--output-dir", tmp_path, "--no-cache", "--jobs", "2")
+    assert result.exit_code == 0, result.output
+
+    dates = {yaml.safe_load(content)["generation_date"] for content in read_tree(tmp_path).values()}
+    assert len(dates) == 1
+
+
+def test_incremental_run_skips_unchanged_schemas(qea_file, tmp_path, full_output):
+    run_cli(qea_file, "--output-dir", tmp_path, "--no-cache", "--incremental")
+    result = run_cli(qea_file, "--output-dir", tmp_path, "--no-cache", "--incremental")
+
+    assert "Wrote 0 schema(s)" in result.output
+    assert {path: content for path, content in read_tree(tmp_path).items() if path in full_output} == full_output
+
+
+def test_incremental_run_regenerates_schemas_of_changed_relations(qea_file, tmp_path):
+    changed_qea_file = tmp_path / "changed.qea"
+    shutil.copy(qea_file, changed_qea_file)
+    out_dir = tmp_path / "schemas"
+    run_cli(changed_qea_file, "--output-dir", out_dir, "--no-cache", "--incremental")
+
+    with closing(sqlite3.connect(changed_qea_file)) as conn, conn:
+        conn.execute("""
+            UPDATE t_connector SET DestRole = 'renamedRole'
+            WHERE Connector_ID = (SELECT min(Connector_ID) FROM t_connector WHERE Connector_Type = 'Association')
+            """)
+    result = run_cli(changed_qea_file, "--output-dir", out_dir, "--no-cache", "--incremental")
+
+    assert "Wrote 0 schema(s)" not in result.output
+    assert any(b"renamedRole" in content for content in read_tree(out_dir).values())
+
+
+def test_cached_project_gives_same_output(qea_file, tmp_path, full_output):
+    cache_dir = tmp_path / "cache"
+    for run in ["miss", "hit"]:
+        out_dir = tmp_path / run
+        run_cli(qea_file, "--output-dir", out_dir, "--cache-dir", cache_dir)
+
+        assert read_tree(out_dir) == full_output
+    assert any(cache_dir.iterdir())
+
+
+def test_reproducible_rerun_leaves_schemas_untouched(qea_file, tmp_path):
+    run_cli(qea_file, "--output-dir", tmp_path, "--no-cache")
+    mtimes = {path: path.stat().st_mtime_ns for path in tmp_path.rglob("*")}
+    result = run_cli(qea_file, "--output-dir", tmp_path, "--no-cache")
+
+    assert "Wrote 0 schema(s)" in result.output
+    assert {path: path.stat().st_mtime_ns for path in tmp_path.rglob("*")} == mtimes
+
+
+def test_rejects_invalid_source_date_epoch(qea_file, tmp_path):
+    result = invoke_cli(qea_file, "--output-dir", tmp_path, "--reproducible", env={"SOURCE_DATE_EPOCH": "yesterday"})
+
+    assert result.exit_code == 2
+    assert "SOURCE_DATE_EPOCH" in result.output
+
+
+def test_several_packages_give_same_schemas_as_separate_runs(qea_file, tmp_path):
+    run_cli(qea_file, "--output-dir", tmp_path / "separate", "--no-cache", "-p", "TC57CIM.Package3")
+    run_cli(qea_file, "--output-dir", tmp_path / "separate", "--no-cache", "-p", "TC57CIM.Package4.Package8")
+    run_cli(
+        qea_file,
+        *["--output-dir", tmp_path / "together", "--no-cache"],
+        *["-p", "TC57CIM.Package3", "-p", "TC57CIM.Package4.Package8"],
+    )
+
+    assert read_tree(tmp_path / "together") == read_tree(tmp_path / "separate")
+
+
+def test_selection_file_sets_options_per_package(qea_file, tmp_path):
+    selection_file = tmp_path / "run" / "selection.yml"
+    selection_file.parent.mkdir()
+    selection_file.write_text(textwrap.dedent("""
+            - package: TC57CIM.Package3
+              single_schema: true
+              output_dir: single
+            - package: TC57CIM.Package4
+            """))
+    run_cli(qea_file, "--output-dir", tmp_path / "run/schemas", "--no-cache", "--selection-file", selection_file)
+    run_cli(
+        qea_file,
+        "--output-dir",
+        tmp_path / "expected/single",
+        "--no-cache",
+        "-p",
+        "TC57CIM.Package3",
+        "--single-schema",
+    )
+    run_cli(qea_file, "--output-dir", tmp_path / "expected/schemas", "--no-cache", "-p", "TC57CIM.Package4")
+    selection_file.unlink()
+
+    # Relative output directories are relative to the selection file.
+    assert read_tree(tmp_path / "run") == read_tree(tmp_path / "expected")
+
+
+def test_rejects_invalid_selection_file(qea_file, tmp_path):
+    selection_file = tmp_path / "selection.yml"
+    selection_file.write_text("- package: TC57CIM\n  single_schema: maybe\n")
+    result = invoke_cli(qea_file, "--output-dir", tmp_path, "--selection-file", selection_file)
+
+    assert result.exit_code == 2
+    assert "single_schema" in result.output
+
+
+def test_threaded_writes_give_same_output(qea_file, tmp_path, full_output):
+    run_cli(qea_file, "--output-dir", tmp_path, "--no-cache", "--write-threads", "2", "--max-in-flight", "1")
+
+    assert read_tree(tmp_path) == full_output
+
+
+@pytest.mark.parametrize("options", [["--lazy"], ["--lazy", "--jobs", "2"]], ids=" ".join)
+def test_lazy_project_gives_same_output(qea_file, tmp_path, full_output, options):
+    run_cli(qea_file, "--output-dir", tmp_path, "--no-cache", *options)
+
+    assert read_tree(tmp_path) == full_output
+
+
+@pytest.mark.parametrize("access", ["immutable", "memory"])
+def test_access_gives_same_output(qea_file, tmp_path, full_output, access):
+    run_cli(qea_file, "--output-dir", tmp_path, "--no-cache", "--access", access)
+
+    assert read_tree(tmp_path) == full_output
+
+
+def test_json_holds_same_schemas_as_yaml(qea_file, tmp_path, full_output):
+    run_cli(qea_file, "--output-dir", tmp_path, "--no-cache", "--format", "json")
+
+    json_output = read_tree(tmp_path)
+    assert {path.removesuffix(".json") for path in json_output} == {path.removesuffix(".yml") for path in full_output}
+    for path, content in full_output.items():
+        schema = json.loads(json_output[path.removesuffix(".yml") + ".json"])
+        assert schema == json.loads(json.dumps(yaml.safe_load(content), default=datetime.isoformat))
+
+
+def test_rejects_json_with_imports(qea_file, tmp_path):
+    result = invoke_cli(qea_file, "--output-dir", tmp_path, "--imports", "--format", "json")
+
+    assert result.exit_code == 2
+    assert "--format json" in result.output
+
+
+@pytest.mark.parametrize("output_dir", ["schemas", "../schemas", "absolute"])
+def test_archive_holds_output_relative_to_output_dir(qea_file, tmp_path, monkeypatch, full_output, output_dir):
+    (tmp_path / "cwd").mkdir()
+    monkeypatch.chdir(tmp_path / "cwd")
+    archive = tmp_path / "schemas.zip"
+    run_cli(
+        qea_file,
+        *["--output-dir", tmp_path / "schemas" if output_dir == "absolute" else output_dir],
+        *["--output-archive", archive, "--no-cache"],
+    )
+
+    with zipfile.ZipFile(archive) as zip_file:
+        assert {name: zip_file.read(name) for name in zip_file.namelist()} == full_output
+    assert not (tmp_path / "schemas").exists()
+
+
+def test_archive_is_reproducible(qea_file, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    for name in ["first.tar.gz", "second.tar.gz"]:
+        run_cli(qea_file, "--output-archive", tmp_path / name, "--no-cache", "--jobs", "2")
+
+    assert (tmp_path / "first.tar.gz").read_bytes() == (tmp_path / "second.tar.gz").read_bytes()
+
+
+def test_rejects_selections_outside_archived_output_dir(qea_file, tmp_path):
+    selection_file = tmp_path / "selection.yml"
+    selection_file.write_text("- package: TC57CIM\n  output_dir: ../elsewhere\n")
+    archive = tmp_path / "schemas.zip"
+    result = invoke_cli(
+        qea_file, "--output-dir", tmp_path, "--selection-file", selection_file, "--output-archive", archive
+    )
+
+    assert result.exit_code == 2
+    assert "--selection-file" in result.output
+    assert not archive.exists()
@@ -0,0 +1,27 @@
+from cim_to_linkml.metrics import Metrics
+
+
+def test_sums_times_of_stages_entered_several_times_per_package():
+    metrics = Metrics()
+    metrics.record("generate", 1.0, package="TC57CIM.Package3")
+    metrics.record("generate", 2.0, package="TC57CIM.Package3")
+    metrics.record("generate", 4.0, package="TC57CIM.Package4")
+
+    assert metrics.stages["generate"]["wall_time"] == 7.0
+    assert metrics.packages == {"TC57CIM.Package3": {"generate": 3.0}, "TC57CIM.Package4": {"generate": 4.0}}
+
+
+def test_merge_sums_times_per_package():
+    metrics = Metrics()
+    metrics.record("generate", 1.0, package="TC57CIM.Package3")
+    worker_metrics = Metrics()
+    worker_metrics.record("generate", 2.0, package="TC57CIM.Package3")
+    worker_metrics.record("write", 0.5, package="TC57CIM.Package3")
+    metrics.merge(worker_metrics)
+
+    assert metrics.stages["generate"] == {
+        "wall_time": 3.0,
+        "count": 2,
+        "peak_rss": metrics.stages["generate"]["peak_rss"],
+    }
+    assert metrics.packages == {"TC57CIM.Package3": {"generate": 3.0, "write": 0.5}}
@@ -0,0 +1,99 @@
+import shutil
+import sqlite3
+from contextlib import closing
+from pathlib import Path
+
+import pytest
+
+from benchmarks.synthetic_qea import SyntheticModel, build_synthetic_qea
+from cim_to_linkml.api import iter_schemas
+from cim_to_linkml.generator import GenerationContext
+from cim_to_linkml.parser import parse_uml_project
+from cim_to_linkml.read import connect, read_uml_project, select_uml_packages
+from cim_to_linkml.selection import Selection
+from cim_to_linkml.uml_model import Project
+from cim_to_linkml.writer import serialize_schema
+
+
+@pytest.fixture(scope="module")
+def sparse_qea_file(tmp_path_factory) -> Path:
+    """A model whose packages depend on few others, so that selecting one leaves most classes out."""
+
+    path = tmp_path_factory.mktemp("qea") / "sparse.qea"
+    build_synthetic_qea(
+        path,
+        SyntheticModel(
+            class_count=200, package_depth=2, packages_per_package=2, relation_density=0.1, generalization_share=0.1
+        ),
+    )
+    return path
+
+
+def read(qea_file, selection: Selection, selected_only: bool) -> Project:
+    with closing(connect(qea_file)) as conn:
+        return parse_uml_project(
+            *read_uml_project(conn, [(selection.package, selection.ignore_subpackages)] if selected_only else None)
+        )
+
+
+def generate(uml_project: Project, selection: Selection) -> dict[str, bytes]:
+    with GenerationContext(uml_project, reproducible=True) as ctx:
+        return {qname: serialize_schema(schema) for qname, schema in iter_schemas(selection, ctx)}
+
+
+@pytest.mark.parametrize(
+    "selection",
+    [
+        Selection("TC57CIM"),
+        Selection("TC57CIM.Package3"),
+        Selection("TC57CIM.Package3", ignore_subpackages=True),
+        Selection("TC57CIM.Package3", single_schema=True),
+        Selection("TC57CIM.Package4.Package8"),
+    ],
+    ids=str,
+)
+def test_selected_read_gives_same_schemas_as_full_read(sparse_qea_file, monkeypatch, selection):
+    monkeypatch.delenv("SOURCE_DATE_EPOCH", raising=False)
+    full_project = read(sparse_qea_file, selection, selected_only=False)
+    selected_project = read(sparse_qea_file, selection, selected_only=True)
+
+    schemas = generate(selected_project, selection)
+    assert schemas
+    assert schemas == generate(full_project, selection)
+
+
+def test_selected_read_leaves_out_unneeded_classes(sparse_qea_file):
+    with closing(connect(sparse_qea_file)) as conn:
+        select_uml_packages(conn, [("TC57CIM.Package4.Package8", False)])
+        (selected,) = conn.execute("SELECT count(*) FROM temp.selected_class").fetchone()
+        (total,) = conn.execute("SELECT count(*) FROM t_object WHERE Object_Type = 'Class'").fetchone()
+
+    assert 0 < selected < total
+
+
+def test_selected_subtree_stops_at_package_boundaries(qea_file, tmp_path):
+    # Siblings whose names share a prefix, e.g. `Base.Wires` and `Base.WiresExt`.
+    wires_qea_file = tmp_path / "wires.qea"
+    shutil.copy(qea_file, wires_qea_file)
+    with closing(sqlite3.connect(wires_qea_file)) as conn, conn:
+        conn.execute("UPDATE t_package SET Name = 'Wires' WHERE Package_ID = 5")
+        conn.execute("UPDATE t_package SET Name = 'WiresExt' WHERE Package_ID = 6")
+
+    with closing(connect(wires_qea_file)) as conn:
+        select_uml_packages(conn, [("TC57CIM.Package3.Wires", False)])
+        selected = [package_id for (package_id,) in conn.execute("SELECT id FROM temp.selected_subtree")]
+
+    assert selected == [5]
+
+
+@pytest.mark.parametrize("access", ["immutable", "memory"])
+def test_access_leaves_file_untouched(qea_file, tmp_path, access):
+    path = tmp_path / "model.qea"
+    shutil.copy(qea_file, path)
+    content = path.read_bytes()
+
+    with closing(connect(path, access)) as conn:
+        list(read_uml_project(conn, [("TC57CIM.Package3", False)])[1])
+
+    assert path.read_bytes() == content
+    assert sorted(tmp_path.iterdir()) == [path]
@@ -0,0 +1,102 @@
+import json
+import shutil
+import sqlite3
+import threading
+import urllib.error
+import urllib.request
+from contextlib import closing
+from urllib.parse import urlencode
+
+import pytest
+
+from cim_to_linkml.serve import SchemaHTTPServer, SchemaRequestHandler, SchemaService
+from tests.helpers import SOURCE_DATE_EPOCH, read_tree, run_cli
+
+
+@pytest.fixture
+def served_qea_file(qea_file, tmp_path):
+    path = tmp_path / "served.qea"
+    shutil.copy(qea_file, path)
+    return path
+
+
+@pytest.fixture
+def server(served_qea_file, monkeypatch):
+    monkeypatch.setenv("SOURCE_DATE_EPOCH", SOURCE_DATE_EPOCH)
+    service = SchemaService(served_qea_file, no_cache=True, reproducible=True)
+    service.reload_if_changed()
+
+    server = SchemaHTTPServer(("127.0.0.1", 0), SchemaRequestHandler)
+    server.service = service
+    thread = threading.Thread(target=server.serve_forever)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+    server.server_close()
+    thread.join()
+
+
+def get(server: str, **params: str) -> tuple[int, bytes]:
+    try:
+        with urllib.request.urlopen(f"{server}/schema?{urlencode(params)}") as response:
+            return response.status, response.read()
+    except urllib.error.HTTPError as e:
+        return e.code, e.read()
+
+
+def change(qea_file, query: str) -> None:
+    with closing(sqlite3.connect(qea_file)) as conn, conn:
+        conn.execute(query)
+
+
+def test_serves_same_schema_as_cli(server, qea_file, tmp_path):
+    run_cli(qea_file, "--output-dir", tmp_path / "schemas", "--no-cache", "-p", "TC57CIM.Package3", "--single-schema")
+
+    assert get(server, package="TC57CIM.Package3") == (200, *read_tree(tmp_path / "schemas").values())
+
+
+def test_serves_schema_per_package(server):
+    status, body = get(server, package="TC57CIM.Package3", mode="per-package", format="json")
+
+    assert status == 200
+    assert set(json.loads(body)) == {"TC57CIM.Package3", "TC57CIM.Package3.Package5", "TC57CIM.Package3.Package6"}
+
+
+@pytest.mark.parametrize(
+    "params, status",
+    [
+        ({"package": "TC57CIM.Unknown"}, 404),
+        ({}, 400),
+        ({"package": "TC57CIM", "mode": "all"}, 400),
+        ({"package": "TC57CIM", "format": "xml"}, 400),
+        ({"package": "TC57CIM", "imports": "true"}, 400),
+    ],
+)
+def test_rejects_invalid_requests(server, params, status):
+    assert get(server, **params)[0] == status
+
+
+def test_generation_errors_are_not_unknown_packages(server, served_qea_file):
+    change(
+        served_qea_file,
+        "UPDATE t_attribute SET Type = 'Missing' WHERE Object_ID IN (SELECT Object_ID FROM t_object WHERE Package_ID = 5)",
+    )
+
+    status, body = get(server, package="TC57CIM.Package3.Package5")
+
+    assert status == 500
+    assert b"Unknown package" not in body
+
+
+def test_reloads_changed_file(server, served_qea_file):
+    change(served_qea_file, "UPDATE t_package SET Name = 'Renamed' WHERE Package_ID = 5")
+
+    assert get(server, package="TC57CIM.Package3.Renamed")[0] == 200
+    assert get(server, package="TC57CIM.Package3.Package5")[0] == 404
+
+
+def test_keeps_serving_when_reloading_fails(server, served_qea_file):
+    status, body = get(server, package="TC57CIM.Package3")
+    served_qea_file.unlink()
+
+    assert get(server, package="TC57CIM.Package3") == (status, body)
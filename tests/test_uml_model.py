@@ -0,0 +1,34 @@
+import pytest
+
+from cim_to_linkml.uml_model import Package, Packages
+
+
+@pytest.fixture
+def packages() -> Packages:
+    return Packages(
+        [
+            Package(id=1, name="Model", parent=0),
+            Package(id=2, name="TC57CIM", parent=1),
+            Package(id=3, name="Base", parent=2),
+            Package(id=4, name="Wires", parent=3),
+            Package(id=5, name="WiresExt", parent=3),
+            Package(id=6, name="Phases", parent=5),
+        ]
+    )
+
+
+def test_qualified_names_leave_out_root(packages):
+    assert packages.get_qualified_name(6) == "TC57CIM.Base.WiresExt.Phases"
+    assert packages.by_qualified_name["TC57CIM.Base.Wires"].id == 4
+
+
+def test_subtree_stops_at_package_boundaries(packages):
+    assert [p.id for p in packages.get_subtree(4)] == [4]
+    assert [p.id for p in packages.get_subtree(5)] == [5, 6]
+    assert [p.id for p in packages.get_subtree(3)] == [3, 4, 5, 6]
+
+
+def test_leaf_packages(packages):
+    assert packages.is_leaf_package("TC57CIM.Base.Wires")
+    assert not packages.is_leaf_package("TC57CIM.Base.WiresExt")
+    assert not packages.is_leaf_package("TC57CIM.Base.Unknown")
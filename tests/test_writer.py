@@ -0,0 +1,122 @@
+from datetime import datetime, timezone
+from typing import Any
+
+import pytest
+import yaml
+
+import cim_to_linkml.linkml_model as linkml_model
+import cim_to_linkml.writer as writer
+from cim_to_linkml.metrics import Metrics
+from cim_to_linkml.writer import (
+    FastSchemaDumper,
+    SchemaDumper,
+    ThreadedSchemaWriter,
+    get_archive_name,
+    serialize_schema,
+)
+
+# Long enough to be broken across lines, and double-quoted for their non-ASCII or control characters.
+NOTES = [
+    "The temperature in °C, measured at the terminal – or at the nearest connectivity node when there is none.",
+    "Reactance (X) at rated frequency, based on the nominal voltage.\tIt is\r\nmeasured\x85between the windings.  ",
+    "Een korte omschrijving van het object, zoals die in het beheersysteem van de netbeheerder wordt gebruikt: é.",
+    "Multiple lines   \nwith trailing spaces   \n  and leading ones, which must be kept as they are in the model.",
+]
+
+
+def make_class(name: str, notes: str) -> linkml_model.Class:
+    attribute = linkml_model.Slot(name="value", slot_uri="cim:Foo.value", range="float", description=notes)
+    return linkml_model.Class(name=name, class_uri="cim:Foo", description=notes, attributes={"value": attribute})
+
+
+def make_schema(notes: str) -> linkml_model.Schema:
+    return linkml_model.Schema(
+        id="https://cim.ucaiug.io/ns/Foo",
+        name="Foo",
+        description=notes,
+        generation_date=datetime(2024, 1, 1, tzinfo=timezone.utc),
+        classes={"Foo": make_class("Foo", notes)},
+        enums={
+            "Bar": linkml_model.Enum(
+                name="Bar",
+                enum_uri="cim:Bar",
+                permissible_values={notes[:40]: {"meaning": linkml_model.PermissibleValue("cim:Bar.baz")}},
+                description=notes,
+            ),
+        },
+    )
+
+
+def dump(schema: Any, dumper: type) -> bytes:
+    return yaml.dump(schema, Dumper=dumper, indent=2, default_flow_style=False, sort_keys=False, encoding="utf-8")
+
+
+@pytest.mark.parametrize("notes", NOTES)
+def test_serialize_schema_matches_pure_python_emitter(notes):
+    schema = make_schema(notes)
+
+    assert serialize_schema(schema) == dump(schema, SchemaDumper)
+
+
+@pytest.mark.parametrize("notes", NOTES)
+def test_serialize_schemas_matches_pure_python_emitter_where_only_some_strings_need_it(notes):
+    schema = make_schema(notes)._replace(
+        classes={
+            "Foo": make_class("Foo", notes),
+            # Too long to be written as a simple key.
+            "Foo" * 50: make_class("Foo" * 50, notes),
+            "Plain": make_class("Plain", "A plain description."),
+        }
+    )
+    schemas = {"Plain": make_schema("A plain description."), "Foo": schema, "Foo.Plain": make_schema("Plain.")}
+
+    assert serialize_schema(schemas) == dump(schemas, SchemaDumper)
+    assert serialize_schema(schema) == dump(schema, SchemaDumper)
+
+
+@pytest.mark.skipif(not yaml.__with_libyaml__, reason="PyYAML is built without libyaml.")
+def test_fast_dumper_matches_pure_python_emitter_for_plain_strings():
+    schema = make_schema("A plain description, long enough to be folded by neither emitter, since plain it stays.")
+
+    assert dump(schema, FastSchemaDumper) == dump(schema, SchemaDumper)
+
+
+def test_threaded_writer_raises_errors_of_its_threads(tmp_path):
+    (tmp_path / "file").touch()
+    metrics = Metrics()
+
+    with pytest.raises(OSError):
+        with ThreadedSchemaWriter(threads=2, max_in_flight=1, metrics=metrics) as writer:
+            writer.submit(b"id: a\n", str(tmp_path / "a.yml"), "a")
+            # Its directory cannot be created, since a file is in the way.
+            writer.submit(b"id: b\n", str(tmp_path / "file" / "b.yml"), "b")
+            writer.join()
+
+    assert (tmp_path / "a.yml").read_bytes() == b"id: a\n"
+
+
+@pytest.mark.parametrize("notes", NOTES[:2])
+def test_json_does_not_depend_on_orjson(monkeypatch, notes):
+    pytest.importorskip("orjson")
+    schema = make_schema(notes)
+    content = serialize_schema(schema, "json")
+    monkeypatch.setattr(writer, "orjson", None)
+
+    assert serialize_schema(schema, "json") == content
+
+
+@pytest.mark.parametrize(
+    "out_file, root_dir, name",
+    [
+        ("schemas/TC57CIM/Base.yml", "schemas", "TC57CIM/Base.yml"),
+        ("../schemas/TC57CIM.yml", "../schemas", "TC57CIM.yml"),
+        ("/tmp/schemas/./TC57CIM.yml", "/tmp/schemas/", "TC57CIM.yml"),
+    ],
+)
+def test_archive_names_are_relative_to_root_dir(out_file, root_dir, name):
+    assert get_archive_name(out_file, root_dir) == name
+
+
+def test_archive_names_lie_within_root_dir():
+    with pytest.raises(ValueError):
+        get_archive_name("elsewhere/TC57CIM.yml", "schemas")